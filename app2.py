@@ -1,13 +1,184 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
-from datetime import datetime
-import numpy as np
-from io import StringIO
-from plotly.subplots import make_subplots
+from datetime import timedelta
+import functools
+
+from telemetry import (
+    DEFAULT_MAX_POINTS,
+    EVENT_LABELS,
+    EVENT_SIGNALS,
+    STREAMING_THRESHOLD_BYTES,
+    TelemetryQuery,
+    events_in_window,
+    has_timestamps,
+    stats_table,
+    telemetry_stats,
+    timestamp_bounds,
+    upload_digest,
+)
+from charts import (
+    CHARTS,
+    DEFAULT_FIGURE_WORKERS,
+    MAX_FIGURE_WORKERS,
+    RENDER_BACKENDS,
+    SCATTER_3D_MAX_POINTS,
+    WEBGL_POINT_THRESHOLD,
+    build_figure,
+    chart_figures,
+    required_columns,
+)
+from fleet import FLEET_SIGNALS, fleet_events_figure, fleet_summaries, fleet_table, signal_distribution_figure
+from ingest import INGEST_POLL_SECONDS, ingest_job
+from live import (
+    LIVE_CAPACITY,
+    LIVE_DIR,
+    LIVE_REFRESH_SECONDS,
+    LIVE_SOURCES,
+    CsvTail,
+    LiveFeed,
+    UdpSource,
+    live_csv_path,
+)
+from metrics import METRICS_DEFAULT, RunMetrics
+
+
+# helpers
+def select_time_window(chart_key):
+    """Narrow the shared time window to the x-range box-selected on a chart."""
+    boxes = st.session_state[chart_key]['selection'].get('box', [])
+    bounds = st.session_state.get('time_window_bounds')
+    if not boxes or bounds is None or len(boxes[0].get('x', [])) != 2:
+        return
+    start, end = sorted(pd.to_datetime(boxes[0]['x']))
+    start, end = max(start, bounds[0]), min(end, bounds[1])
+    if start < end:
+        st.session_state['time_window'] = (start.to_pydatetime(), end.to_pydatetime())
+
+
+def reset_time_window():
+    bounds = st.session_state.get('time_window_bounds')
+    if bounds is not None:
+        st.session_state['time_window'] = (bounds[0].to_pydatetime(), bounds[1].to_pydatetime())
+
+
+EVENT_PADDING = pd.Timedelta(minutes=1)  # context shown on each side of an event picked from the table
+EVENT_TABLE_MAX = 1000
+
+
+def select_event(table_key, events):
+    """Zoom the shared time window (and the daily charts) to the event picked in the event table."""
+    rows = st.session_state[table_key]['selection']['rows']
+    bounds = st.session_state.get('time_window_bounds')
+    if not rows or bounds is None:
+        return
+    event = events.iloc[rows[0]]
+    if pd.isna(event['start']):
+        return
+    pad = max(event['duration'], EVENT_PADDING)
+    start, end = max(event['start'] - pad, bounds[0]), min(event['end'] + pad, bounds[1])
+    st.session_state['time_window'] = (start.to_pydatetime(), end.to_pydatetime())
+    st.session_state['selected_day'] = event['start'].date()
+
+
+VIEW_MODES = {'file': 'ملف واحد', 'fleet': 'أسطول (عدة ملفات)', 'live': 'بث مباشر'}
+
+
+def close_live_feed():
+    """Close the session's LiveFeed, if any, releasing its file or UDP port."""
+    current = st.session_state.pop('live_feed', None)
+    if current is not None:
+        current[1].close()
+
+
+def live_feed(source, target, capacity):
+    """The session's LiveFeed for a source, replaced (and the old one closed) when the settings change."""
+    key = (source, target, capacity)
+    current = st.session_state.get('live_feed')
+    if current is not None and current[0] == key:
+        return current[1]
+    close_live_feed()
+    feed = LiveFeed(CsvTail(live_csv_path(target)) if source == 'csv' else UdpSource(int(target)), capacity)
+    st.session_state['live_feed'] = (key, feed)
+    return feed
+
+
+def show_live(feed, chart_names):
+    """One refresh of the live view: poll the feed, then redraw the charts from the ring buffer only."""
+    try:
+        new_rows = feed.poll()
+    except OSError as e:
+        st.error(f"Error: {str(e)}")
+        return
+    data = feed.frame()
+    live_cols = st.columns(3)
+    live_cols[0].metric("الصفوف في الذاكرة", f"{len(data):,}")
+    live_cols[1].metric("إجمالي الصفوف المستلمة", f"{feed.received:,}")
+    live_cols[2].metric("صفوف جديدة", f"{new_rows:,}")
+    bounds = timestamp_bounds(data)
+    if bounds is None:
+        st.info("في انتظار البيانات...")
+        return
+
+    # the whole buffer, and its latest day for the daily charts
+    query = TelemetryQuery(data).select(bounds, bounds[1].date())
+    live_inputs = dict(
+        query=query,
+        selected_day=query.day,
+        window=query.window,
+        stats=None,
+        events=None,
+        max_points=DEFAULT_MAX_POINTS,
+        render_backend='auto',
+        webgl_threshold=WEBGL_POINT_THRESHOLD,
+        max_3d_points=SCATTER_3D_MAX_POINTS,
+    )
+    rows = [chart_names[i:i+2] for i in range(0, len(chart_names), 2)]
+    for row in rows:
+        cols = st.columns([1, 1])
+        for i, chart_name in enumerate(row):
+            with cols[i]:
+                fig = build_figure(chart_name, live_inputs)
+                if isinstance(fig, str):
+                    st.error(fig)
+                else:
+                    st.plotly_chart(fig, use_container_width=True, key=f"live_{chart_name}")
+
+
+def show_preview(job, uploaded_file):
+    """Early file info from the first rows, shown while the rest of the upload is being read."""
+    info_cols = st.columns(2)
+    info_cols[0].metric("حجم الملف", f"{uploaded_file.size / 1024 ** 2:.1f} MB")
+    if job.preview is None:
+        return
+    info_cols[1].metric("الأعمدة المطلوبة", f"{len(job.preview.columns):,}")
+    bounds = timestamp_bounds(job.preview)
+    if bounds is not None:
+        st.caption(f"يبدأ في {bounds[0]:%Y-%m-%d %H:%M:%S}")
+    with st.expander(f"ملخص أولي من أول {len(job.preview):,} صف"):
+        st.dataframe(stats_table(job.preview_stats), use_container_width=True)
+
+
+def watch_ingest(job):
+    """Progress of a background ingestion, polled by a fragment; reruns the page once the data is ready."""
+    if job.done:
+        st.rerun()
+    st.progress(job.fraction(), text=job.status)
+    st.caption("ستظهر المخططات المختارة عند اكتمال قراءة الملف")
+
+
+def show_time_chart(fig, chart_name):
+    """Render a time-series chart; a horizontal box selection on it zooms the shared time window.
+
+    The figure is expected to be in select drag mode already (see chart_figure).
+    """
+    key = f"fig_{chart_name}"
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=key,
+        on_select=functools.partial(select_time_window, key),
+        selection_mode='box'
+    )
 
 
 # streamlit configuration
@@ -90,57 +261,108 @@ st.markdown("""
 
 st.markdown('<div class="header-container"><h1> Vehicle Data Plate ⚙ </h1></div>', unsafe_allow_html=True)
 
-# Description of charts
-chart_descriptions = {
-    "1. Histogram of Engine RPM": "رسم بياني يوضح توزيع دورات المحرك، مع تمييز الدورات العالية والمنخفضة",
-    "2. Line Graph of Engine RPM over time": "مخطط زمني يظهر تغيرات دورات المحرك مع الوقت، مع تمييز ملون للدورات العالية",
-    "3. Line Graph of Coolant Temperature": "مخطط درجة حرارة سائل التبريد على مدار الزمن، مع خط تحذير عند 105 درجة مئوية",
-    "4. Histogram of Oil Temperature": "رسم بياني يوضح توزيع درجات حرارة الزيت مع إظهار المتوسط والوسيط",
-    "5. Line Graph of Oil Temperature": "مخطط زمني يظهر تغيرات درجة حرارة الزيت على مدار اليوم",
-    "6. Line Graph of Engine RPM and Oil Temperature": "مخطط مزدوج يظهر العلاقة بين دورات المحرك ودرجة حرارة الزيت",
-    "7. Line Graph of Engine Load Percent & RPM": "مخطط مزدوج يظهر العلاقة بين حمل المحرك ودوراته",
-    "8. Histogram of Battery Voltage": "رسم بياني يوضح توزيع قيم جهد البطارية",
-    "9. Line Graph of Battery Voltage": "مخطط زمني يظهر تغيرات جهد البطارية على مدار اليوم",
-    "10. Line Graph of Manifold Absolute Pressure": "مخطط ضغط الهواء داخل مشعب السحب (MAP) مقاساً بالكيلو باسكال",
-    "11. Line Graph of Mass Air Flow": "مخطط زمني لتدفق كتلة الهواء (MAF) مقاساً بالجرام في الثانية",
-    "12. 3D Scatter Plot of Engine Parameters": "رسم ثلاثي الأبعاد يوضح العلاقة بين دورات المحرك وتوقيت الإشعال وضغط مشعب السحب",
-    "13. Line Graph of Exhaust Gas Recirculation": "مخطط زمني لحالة نظام إعادة تدوير غاز العادم (EGR)",
-    "14. Line Graph of Catalytic Converter Efficiency": "مخطط زمني يوضح كفاءة عمل المحول الحفاز",
-    "15. Line Graph of Brake Status": "مخطط زمني يوضح حالة الفرامل",
-    "16. Line Graph of Tire Pressure": "مخطط زمني يوضح ضغط الإطارات بالـ PSI",
-    "17. Line Graph of Ambient Temperature": "مخطط زمني يوضح درجة الحرارة المحيطة بالمركبة"
-}
-
 # upload file section
 st.markdown('<div class="upload-container">', unsafe_allow_html=True)
 col1, col2 = st.columns([1, 1])
 
 with col1:
     st.markdown("<h2 style='text-align: center;'>رفع ملف البيانات</h2>", unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("قم برفع ملف CSV يحتوي على بيانات المركبة", type="csv")
+    view_mode = st.radio("وضع العرض", list(VIEW_MODES), format_func=VIEW_MODES.get, horizontal=True, key="view_mode")
+    uploaded_file, uploaded_files = None, []
+    if view_mode != 'live':
+        close_live_feed()
+    if view_mode == 'fleet':
+        uploaded_files = st.file_uploader(
+            "قم برفع ملفات بيانات المركبات (ملف لكل مركبة)",
+            type=["csv", "parquet", "feather", "arrow"],
+            accept_multiple_files=True,
+            key="fleet_files"
+        )
+    elif view_mode == 'live':
+        live_source = st.radio("المصدر", list(LIVE_SOURCES), format_func=LIVE_SOURCES.get, horizontal=True, key="live_source")
+        if live_source == 'csv':
+            live_target = st.text_input(f"مسار ملف CSV داخل المجلد {LIVE_DIR}", key="live_path")
+        else:
+            live_target = st.number_input("رقم المنفذ", min_value=1024, max_value=65535, value=9870, key="live_port")
+        live_capacity = st.number_input(
+            "عدد الصفوف المحفوظة في الذاكرة",
+            min_value=1000,
+            max_value=1_000_000,
+            value=LIVE_CAPACITY,
+            step=1000,
+            key="live_capacity"
+        )
+        live_refresh = st.number_input(
+            "فترة التحديث (ثانية)",
+            min_value=0.2,
+            max_value=60.0,
+            value=LIVE_REFRESH_SECONDS,
+            step=0.5,
+            key="live_refresh"
+        )
+    else:
+        uploaded_file = st.file_uploader("قم برفع ملف CSV يحتوي على بيانات المركبة", type=["csv", "parquet", "feather", "arrow"])
 
 with col2:
     st.markdown("<h2 style='text-align: center;'> File info </h2>", unsafe_allow_html=True)
-    if uploaded_file is not None:
-        st.success("✅ تم رفع الملف !")
-        st.info("You can now choose which charts you want to view from the options below.")
+    if uploaded_files:
+        info_cols = st.columns(2)
+        info_cols[0].metric("عدد المركبات", f"{len(uploaded_files):,}")
+        info_cols[1].metric("حجم الملفات", f"{sum(f.size for f in uploaded_files) / 1024 ** 2:.1f} MB")
+    elif view_mode == 'live':
+        st.info("يتم عرض آخر الصفوف الواردة فقط، وتُحدَّث المخططات تلقائياً")
+    elif uploaded_file is not None:
+        file_info = st.container()
+        chunked = st.toggle(
+            "قراءة الملف على دفعات (للملفات الكبيرة)",
+            value=uploaded_file.size > STREAMING_THRESHOLD_BYTES,
+            key="chunked_ingestion"
+        )
+        collect_metrics = st.toggle("قياس زمن المراحل وحجم المخططات", value=METRICS_DEFAULT, key="collect_metrics")
     else:
         st.warning("⚠️Failed to upload the file")
 st.markdown('</div>', unsafe_allow_html=True)
 
 
-if uploaded_file is not None:
+if uploaded_files:
     try:
-        data = pd.read_csv(uploaded_file)
+        st.markdown("<h2 style='text-align: center;'>Fleet Overview</h2>", unsafe_allow_html=True)
         
-        # تحويل الوقت إلى تنسيق التاريخ
-        if 'Timestamp' in data.columns:
-            try:
-                data['Timestamp'] = pd.to_datetime(data['Timestamp'])
-                data['Date'] = data['Timestamp'].dt.date
-            except:
-                st.warning("error converting Timestamp to datetime format")
+        # ملخص لكل مركبة يُحسب على دفعات دون الاحتفاظ بالصفوف
+        summaries = fleet_summaries(uploaded_files)
+        st.dataframe(fleet_table(summaries), use_container_width=True)
         
+        fleet_cols = st.columns([1, 1])
+        with fleet_cols[0]:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            signal = st.selectbox("الإشارة", list(FLEET_SIGNALS), format_func=FLEET_SIGNALS.get, key="fleet_signal")
+            st.plotly_chart(signal_distribution_figure(summaries, signal), use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+        with fleet_cols[1]:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            st.plotly_chart(fleet_events_figure(summaries), use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+elif view_mode == 'live':
+    if live_target:
+        try:
+            feed = live_feed(live_source, live_target, live_capacity)
+            st.markdown("<h2 style='text-align: center;'>Live Charts</h2>", unsafe_allow_html=True)
+            live_charts = st.multiselect(
+                "المخططات المعروضة",
+                [name for name, spec in CHARTS.items() if spec.time_series],
+                default=["2. Line Graph of Engine RPM over time", "3. Line Graph of Coolant Temperature"],
+                key="live_charts"
+            )
+            st.fragment(show_live, run_every=live_refresh)(feed, live_charts)
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+    else:
+        st.info("--أدخل مسار الملف الذي تتم الكتابة فيه--")
+elif uploaded_file is not None:
+    try:
         st.markdown("<h2 style='text-align: center;'> Choose the charts you want to view </h2>", unsafe_allow_html=True)
 
         st.markdown('<div class="chart-options-grid">', unsafe_allow_html=True)
@@ -148,7 +370,7 @@ if uploaded_file is not None:
         selected_charts = {}
         
         col_count = 3  # عدد الأعمدة في كل صف
-        chart_items = list(chart_descriptions.items())
+        chart_items = [(name, spec.description) for name, spec in CHARTS.items()]
         rows = [chart_items[i:i+col_count] for i in range(0, len(chart_items), col_count)]
         
         for row in rows:
@@ -165,10 +387,159 @@ if uploaded_file is not None:
         
         st.markdown('</div>', unsafe_allow_html=True)
         
-        if any(selected_charts.values()):
+        charts_to_show = [chart for chart, selected in selected_charts.items() if selected]
+        metrics = RunMetrics(enabled=collect_metrics)
+        digest = upload_digest(uploaded_file, metrics)
+        # أعمدة المخططات المختارة، مع أعمدة كشف الأحداث؛ القراءة تبدأ في الخلفية فور رفع الملف
+        columns = tuple(sorted(set(required_columns(charts_to_show)) | set(EVENT_SIGNALS)))
+        job = ingest_job(digest, columns, chunked, uploaded_file)
+        
+        if not job.done:
+            with file_info:
+                show_preview(job, uploaded_file)
+            st.fragment(watch_ingest, run_every=INGEST_POLL_SECONDS)(job)
+        else:
+            data, histograms, events, rollups = job.result()
+            # كل بيانات المخططات تُطلب من هذا الكائن
+            query = TelemetryQuery(data, digest, chunked, histograms, rollups)
+            # أزمنة القراءة تُسجَّل مرة واحدة لكل ملف في الجلسة
+            if metrics.enabled and st.session_state.get('ingest_timed') != (digest, columns, chunked):
+                st.session_state['ingest_timed'] = (digest, columns, chunked)
+                for stage, seconds in job.timings.items():
+                    metrics.record(stage, seconds)
+            
+            if 'Timestamp' in data.columns and not has_timestamps(data):
+                st.warning("error converting Timestamp to datetime format")
+            if data.attrs.get('missing_timestamps'):
+                st.warning(f"⚠️ {data.attrs['missing_timestamps']:,} صف بدون توقيت صالح (Timestamp فارغ أو غير قابل للقراءة)، ولن تظهر في المخططات الزمنية")
+            if data.attrs.get('duplicate_timestamps'):
+                st.info(f"{data.attrs['duplicate_timestamps']:,} صف يتكرر توقيتها مع الصف السابق")
+            
+            with metrics.stage('stats'):
+                stats = telemetry_stats(digest, chunked, tuple(data.columns), data, histograms)
+            with file_info:
+                bounds = query.bounds()
+                info_cols = st.columns(2)
+                info_cols[0].metric("عدد السجلات", f"{max((s['count'] for s in stats.values()), default=len(data)):,}")
+                info_cols[1].metric("حجم الملف", f"{uploaded_file.size / 1024 ** 2:.1f} MB")
+                if bounds is not None:
+                    st.caption(f"من {bounds[0]:%Y-%m-%d %H:%M:%S} إلى {bounds[1]:%Y-%m-%d %H:%M:%S}")
+                with st.expander("ملخص إحصائي للأعمدة"):
+                    st.dataframe(stats_table(stats), use_container_width=True)
+                    if rollups:
+                        st.caption("مستويات التجميع الزمني: " + "، ".join(f"{name} ({len(level):,})" for name, level in rollups.items()))
+        
+        if job.done and charts_to_show:
             st.markdown("<h2 style='text-align: center;'>Vehicle Charts</h2>", unsafe_allow_html=True)
+            
+            with st.expander("⚙ إعدادات العرض"):
+                show_raw = st.checkbox("عرض البيانات الخام بدون تقليل النقاط", key="show_raw")
+                max_points = st.slider(
+                    "الحد الأقصى للنقاط في كل سلسلة زمنية",
+                    min_value=500,
+                    max_value=20000,
+                    value=DEFAULT_MAX_POINTS,
+                    step=500,
+                    disabled=show_raw,
+                    key="max_points"
+                )
+                render_backend = st.radio(
+                    "طريقة الرسم",
+                    list(RENDER_BACKENDS),
+                    format_func=RENDER_BACKENDS.get,
+                    horizontal=True,
+                    key="render_backend"
+                )
+                webgl_threshold = st.number_input(
+                    "التبديل إلى WebGL عند تجاوز عدد النقاط",
+                    min_value=1000,
+                    value=WEBGL_POINT_THRESHOLD,
+                    step=1000,
+                    disabled=render_backend != 'auto',
+                    key="webgl_threshold"
+                )
+                max_3d_points = st.number_input(
+                    "الحد الأقصى لنقاط المخطط ثلاثي الأبعاد",
+                    min_value=1000,
+                    value=SCATTER_3D_MAX_POINTS,
+                    step=1000,
+                    disabled=show_raw,
+                    key="max_3d_points"
+                )
+                figure_workers = st.number_input(
+                    "عدد العمليات التي تبني المخططات بالتوازي",
+                    min_value=1,
+                    max_value=MAX_FIGURE_WORKERS,
+                    value=DEFAULT_FIGURE_WORKERS,
+                    key="figure_workers"
+                )
+                if show_raw:
+                    max_points = None
+                    max_3d_points = None
+                
+                # النطاق الزمني المعروض في المخططات الزمنية
+                bounds = query.bounds()
+                window = bounds
+                if bounds is not None and bounds[0] < bounds[1]:
+                    # also when the slider's state was dropped on a run that did not draw it
+                    if st.session_state.get('time_window_bounds') != bounds or 'time_window' not in st.session_state:
+                        st.session_state['time_window_bounds'] = bounds
+                        reset_time_window()
+                    window = st.slider(
+                        "النطاق الزمني (أو حدد نطاقاً على أي مخطط زمني لتكبيره)",
+                        min_value=bounds[0].to_pydatetime(),
+                        max_value=bounds[1].to_pydatetime(),
+                        step=timedelta(seconds=1),
+                        format="YYYY-MM-DD HH:mm:ss",
+                        key="time_window"
+                    )
+                    st.button("عرض كامل الفترة", on_click=reset_time_window)
+                
+                # اليوم المعروض في المخططات اليومية (3، 5، 9)
+                selected_day = None
+                days = query.days()
+                visible_days = [
+                    day for day in days
+                    if window is not None and pd.Timestamp(day) <= pd.Timestamp(window[1])
+                    and pd.Timestamp(day) + pd.Timedelta(days=1) > pd.Timestamp(window[0])
+                ]
+                if visible_days:
+                    selected_day = st.selectbox("اليوم المعروض في المخططات اليومية", visible_days, key="selected_day")
+                query = query.select(window, selected_day)
+            
+            with st.expander(f"⚠ الأحداث المكتشفة ({len(events):,})"):
+                if events.empty:
+                    st.info("لم يتم العثور على أي تجاوز للحدود")
+                else:
+                    counts = events['event'].value_counts()
+                    for count_col, (event, count) in zip(st.columns(len(counts)), counts.items()):
+                        count_col.metric(EVENT_LABELS.get(event, event), f"{count:,}")
+                    shown = events_in_window(events, *window) if window is not None else events
+                    if len(shown) > EVENT_TABLE_MAX:
+                        st.caption(f"عرض أول {EVENT_TABLE_MAX:,} حدث من {len(shown):,} في النطاق الزمني المعروض")
+                        shown = shown.iloc[:EVENT_TABLE_MAX]
+                    st.dataframe(
+                        shown.drop(columns=['start_row', 'stop_row']).assign(event=shown['event'].map(EVENT_LABELS)),
+                        hide_index=True,
+                        use_container_width=True,
+                        key="event_table",
+                        on_select=functools.partial(select_event, "event_table", shown),
+                        selection_mode="single-row"
+                    )
+                    st.caption("اختر حدثاً من الجدول لعرض الفترة المحيطة به في المخططات الزمنية")
 
-            charts_to_show = [chart for chart, selected in selected_charts.items() if selected]
+            chart_inputs = dict(
+                query=query,
+                selected_day=query.day,
+                window=query.window,
+                stats=stats,
+                events=events,
+                max_points=max_points,
+                render_backend=render_backend,
+                webgl_threshold=webgl_threshold,
+                max_3d_points=max_3d_points,
+            )
+            figures = dict(zip(charts_to_show, chart_figures(charts_to_show, chart_inputs, figure_workers, metrics)))
             rows = [charts_to_show[i:i+2] for i in range(0, len(charts_to_show), 2)]
             
             for row in rows:
@@ -177,640 +548,34 @@ if uploaded_file is not None:
                     with cols[i]:
                         st.markdown(f'<div class="chart-container"><h3>{chart_name}</h3>', unsafe_allow_html=True)
                         
-##--------------------------------------------------------------  الرسم البياني حسب النوع
-
-                        if chart_name == "1. Histogram of Engine RPM":
-                            if 'Engine_RPM' in data.columns:
-                                rpm_threshold = 6000
-                                normal_rpm = data[data['Engine_RPM'] <= rpm_threshold]
-                                high_rpm = data[data['Engine_RPM'] > rpm_threshold]
-                                
-                                fig = go.Figure()
-                                fig.add_trace(go.Histogram(
-                                    x=normal_rpm['Engine_RPM'],
-                                    nbinsx=50,
-                                    name='دورات عادية',
-                                    marker_color='green',
-                                    opacity=0.75
-                                ))
-                                fig.add_trace(go.Histogram(
-                                    x=high_rpm['Engine_RPM'],
-                                    nbinsx=50,
-                                    name='دورات عالية',
-                                    marker_color='red',
-                                    opacity=0.75
-                                ))
-                                
-                                fig.update_layout(
-                                    title='توزيع دورات المحرك',
-                                    xaxis_title='دورات المحرك (RPM)',
-                                    yaxis_title='العدد',
-                                    barmode='overlay',
-                                    template='plotly_white',
-                                    height=400,
-                                    legend=dict(title='فئة الدورات')
-                                )
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود Engine_RPM غير موجود في البيانات")
-                                
-                        elif chart_name == "2. Line Graph of Engine RPM over time":
-                            if 'Engine_RPM' in data.columns and 'Timestamp' in data.columns:
-                                traces = []
-                                
-                                for i in range(len(data) - 1):
-                                    x_segment = [data["Timestamp"].iloc[i], data["Timestamp"].iloc[i+1]]
-                                    y_segment = [data["Engine_RPM"].iloc[i], data["Engine_RPM"].iloc[i+1]]
-                                    
-                                    color = 'orangered' if y_segment[0] > 6500 or y_segment[1] > 6500 else 'seagreen'
-                                    
-                                    traces.append(go.Scatter(
-                                        x=x_segment,
-                                        y=y_segment,
-                                        mode='lines',
-                                        line=dict(color=color, width=3),
-                                        showlegend=False
-                                    ))
-                                
-                                fig = go.Figure(data=traces)
-                                fig.update_layout(
-                                    title="دورات المحرك عبر الزمن",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="دورات المحرك (RPM)",
-                                    xaxis=dict(
-                                        tickformat="%H:%M:%S",
-                                        tickangle=45
-                                    ),
-                                    template="plotly_white",
-                                    height=400
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("بعض الأعمدة المطلوبة غير موجودة في البيانات")
-                        
-                        elif chart_name == "3. Line Graph of Coolant Temperature":
-                            if 'Coolant_Temp_C' in data.columns and 'Timestamp' in data.columns and 'Date' in data.columns:
-                                unique_days = data['Date'].unique()
-                                
-                                if len(unique_days) > 0:
-                                    day = unique_days[0]  # عرض اليوم الأول فقط
-                                    day_data = data[data['Date'] == day].sort_values('Timestamp')
-                                    
-                                    fig = go.Figure()
-                                    
-                                    for i in range(len(day_data) - 1):
-                                        x_segment = [day_data['Timestamp'].iloc[i], day_data['Timestamp'].iloc[i+1]]
-                                        y_segment = [day_data['Coolant_Temp_C'].iloc[i], day_data['Coolant_Temp_C'].iloc[i+1]]
-                                        
-                                        color = 'orangered' if y_segment[0] > 105 or y_segment[1] > 105 else 'seagreen'
-                                        
-                                        fig.add_trace(go.Scatter(
-                                            x=x_segment,
-                                            y=y_segment,
-                                            mode='lines',
-                                            line=dict(color=color, width=3),
-                                            showlegend=False
-                                        ))
-                                    
-                                    fig.add_shape(
-                                        type='line',
-                                        x0=day_data['Timestamp'].min(),
-                                        x1=day_data['Timestamp'].max(),
-                                        y0=105,
-                                        y1=105,
-                                        line=dict(color='red', width=2, dash='dash'),
-                                    )
-                                    
-                                    fig.update_layout(
-                                        title=f'درجة حرارة سائل التبريد بتاريخ {day}',
-                                        xaxis_title='الوقت',
-                                        yaxis_title='درجة حرارة سائل التبريد (°C)',
-                                        xaxis=dict(tickangle=45),
-                                        template='plotly_white',
-                                        height=400,
-                                    )
-                                    
-                                    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                    
-                                    st.plotly_chart(fig, use_container_width=True)
-                                else:
-                                    st.error("لم يتم العثور على بيانات التاريخ")
-                            else:
-                                st.error("بعض الأعمدة المطلوبة غير موجودة في البيانات")
-                        
-                        elif chart_name == "4. Histogram of Oil Temperature":
-                            if 'Oil_Temp_C' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Histogram(
-                                    x=data['Oil_Temp_C'],
-                                    nbinsx=30,
-                                    marker_color='orange',
-                                    opacity=0.6,
-                                    name='توزيع درجة حرارة الزيت'
-                                ))
-                                
-                                fig.add_shape(
-                                    type='line',
-                                    x0=data['Oil_Temp_C'].mean(),
-                                    x1=data['Oil_Temp_C'].mean(),
-                                    y0=0,
-                                    y1=1,
-                                    yref='paper',
-                                    line=dict(color='blue', width=2, dash='dash'),
-                                    name='المتوسط'
-                                )
-                                
-                                fig.add_shape(
-                                    type='line',
-                                    x0=data['Oil_Temp_C'].median(),
-                                    x1=data['Oil_Temp_C'].median(),
-                                    y0=0,
-                                    y1=1,
-                                    yref='paper',
-                                    line=dict(color='green', width=2, dash='dash'),
-                                    name='الوسيط'
-                                )
-                                
-                                fig.update_layout(
-                                    title='توزيع درجة حرارة الزيت (°C)',
-                                    xaxis_title='درجة حرارة الزيت (°C)',
-                                    yaxis_title='التكرار',
-                                    template='plotly_white',
-                                    height=400,
-                                    legend=dict(
-                                        y=0.99,
-                                        x=0.01,
-                                        title_text=''
-                                    )
-                                )
-                                
-                                fig.add_annotation(
-                                    x=data['Oil_Temp_C'].mean(),
-                                    y=0.95,
-                                    yref='paper',
-                                    text=f"المتوسط: {data['Oil_Temp_C'].mean():.1f}°C",
-                                    showarrow=True,
-                                    arrowhead=1,
-                                    ax=50,
-                                    ay=-30
-                                )
-                                
-                                fig.add_annotation(
-                                    x=data['Oil_Temp_C'].median(),
-                                    y=0.85,
-                                    yref='paper',
-                                    text=f"الوسيط: {data['Oil_Temp_C'].median():.1f}°C",
-                                    showarrow=True,
-                                    arrowhead=1,
-                                    ax=-50,
-                                    ay=-30
-                                )
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود Oil_Temp_C غير موجود في البيانات")
-                        
-                        elif chart_name == "5. Line Graph of Oil Temperature":
-                            if 'Oil_Temp_C' in data.columns and 'Timestamp' in data.columns and 'Date' in data.columns:
-                                unique_days = data['Date'].unique()
-                                
-                                if len(unique_days) > 0:
-                                    day = unique_days[0]  # عرض اليوم الأول فقط
-                                    day_data = data[data['Date'] == day].sort_values('Timestamp')
-                                    
-                                    fig = go.Figure()
-                                    
-                                    fig.add_trace(
-                                        go.Scatter(
-                                            x=day_data['Timestamp'],
-                                            y=day_data['Oil_Temp_C'],
-                                            mode='lines+markers',
-                                            line=dict(color='darkorange', width=3),
-                                            name='درجة حرارة الزيت'
-                                        )
-                                    )
-                                    
-                                    fig.update_layout(
-                                        title=f'درجة حرارة الزيت (°C) بتاريخ {day}',
-                                        xaxis_title='الوقت',
-                                        yaxis_title='درجة حرارة الزيت (°C)',
-                                        xaxis=dict(tickangle=50),
-                                        template='plotly_white',
-                                        height=400,
-                                    )
-                                    
-                                    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                    
-                                    st.plotly_chart(fig, use_container_width=True)
+                        fig = figures[chart_name]
+                        if isinstance(fig, str):
+                            st.error(fig)
+                        else:
+                            with metrics.stage('render', chart_name):
+                                if CHARTS[chart_name].time_series:
+                                    show_time_chart(fig, chart_name)
                                 else:
-                                    st.error("لم يتم العثور على بيانات التاريخ")
-                            else:
-                                st.error("بعض الأعمدة المطلوبة غير موجودة في البيانات")
-                                
-
-                        elif chart_name == "6. Line Graph of Engine RPM and Oil Temperature":
-                            if all(col in data.columns for col in ['Engine_RPM', 'Oil_Temp_C', 'Timestamp']):
-                                fig = make_subplots(specs=[[{"secondary_y": True}]])
-                                
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=data["Timestamp"],
-                                        y=data["Engine_RPM"],
-                                        mode='lines+markers',
-                                        name='دورات المحرك',
-                                        line=dict(color='darkgreen', width=3),
-                                        marker=dict(size=7)
-                                    ),
-                                    secondary_y=False
-                                )
-                                
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=data["Timestamp"],
-                                        y=data["Oil_Temp_C"],
-                                        mode='lines+markers',
-                                        name='درجة حرارة الزيت',
-                                        line=dict(color='darkorange', width=3),
-                                        marker=dict(size=7)
-                                    ),
-                                    secondary_y=True
-                                )
-                                
-                                fig.update_layout(
-                                    title="العلاقة بين دورات المحرك ودرجة حرارة الزيت",
-                                    xaxis_title="الوقت",
-                                    template="plotly_white",
-                                    height=400,
-                                    legend=dict(
-                                        orientation="h",
-                                        yanchor="bottom",
-                                        y=1.02,
-                                        xanchor="right",
-                                        x=1
-                                    )
-                                )
-                                
-                                fig.update_yaxes(title_text="دورات المحرك (RPM)", secondary_y=False, color="darkgreen")
-                                fig.update_yaxes(title_text="درجة حرارة الزيت (°C)", secondary_y=True, color="darkorange")
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("بعض الأعمدة المطلوبة غير موجودة في البيانات")
-                        
-                        elif chart_name == "7. Line Graph of Engine Load Percent & RPM":
-                            if all(col in data.columns for col in ['Engine_RPM', 'Engine_Load_Percent', 'Timestamp']):
-                                fig = make_subplots(specs=[[{"secondary_y": True}]])
-                                
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=data["Timestamp"],
-                                        y=data["Engine_RPM"],
-                                        mode='lines',
-                                        name='دورات المحرك',
-                                        line=dict(color='chocolate', width=3),
-                                    ),
-                                    secondary_y=False
-                                )
-                                
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=data["Timestamp"],
-                                        y=data["Engine_Load_Percent"],
-                                        mode='lines',
-                                        name='حمل المحرك (%)',
-                                        line=dict(color='blue', width=3),
-                                    ),
-                                    secondary_y=True
-                                )
-                                
-                                fig.update_layout(
-                                    title="العلاقة بين دورات المحرك ونسبة الحمل",
-                                    xaxis_title="الوقت",
-                                    template="plotly_white",
-                                    height=400,
-                                    legend=dict(
-                                        orientation="h",
-                                        yanchor="bottom",
-                                        y=1.02,
-                                        xanchor="right",
-                                        x=1
-                                    )
-                                )
-                                
-                                fig.update_yaxes(title_text="دورات المحرك (RPM)", secondary_y=False, color="chocolate")
-                                fig.update_yaxes(title_text="نسبة حمل المحرك (%)", secondary_y=True, color="blue")
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("بعض الأعمدة المطلوبة غير موجودة في البيانات")
-                                
-                        elif chart_name == "8. Histogram of Battery Voltage":
-                            if 'Battery_Voltage_V' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Histogram(
-                                    x=data['Battery_Voltage_V'],
-                                    nbinsx=30,
-                                    marker_color='green',
-                                    opacity=0.75,
-                                    name='توزيع جهد البطارية'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="توزيع جهد البطارية",
-                                    xaxis_title="جهد البطارية (فولت)",
-                                    yaxis_title="التكرار",
-                                    template="plotly_white",
-                                    height=400
-                                )
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود Battery_Voltage_V غير موجود في البيانات")
-                                
-                        elif chart_name == "9. Line Graph of Battery Voltage":
-                            if 'Battery_Voltage_V' in data.columns and 'Timestamp' in data.columns and 'Date' in data.columns:
-                                unique_days = data['Date'].unique()
-                                
-                                if len(unique_days) > 0:
-                                    day = unique_days[0]  # عرض اليوم الأول فقط
-                                    day_data = data[data['Date'] == day].sort_values('Timestamp')
-                                    
-                                    fig = go.Figure()
-                                    
-                                    fig.add_trace(
-                                        go.Scatter(
-                                            x=day_data['Timestamp'],
-                                            y=day_data['Battery_Voltage_V'],
-                                            mode='lines+markers',
-                                            line=dict(color='teal', width=3),
-                                            name='جهد البطارية'
-                                        )
-                                    )
-                                    
-                                    fig.update_layout(
-                                        title=f'جهد البطارية بتاريخ {day}',
-                                        xaxis_title='الوقت',
-                                        yaxis_title='جهد البطارية (فولت)',
-                                        xaxis=dict(tickangle=50),
-                                        template='plotly_white',
-                                        height=400,
-                                    )
-                                    
-                                    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                    
                                     st.plotly_chart(fig, use_container_width=True)
-                                else:
-                                    st.error("لم يتم العثور على بيانات التاريخ")
-                            else:
-                                st.error("بعض الأعمدة المطلوبة غير موجودة في البيانات")
-                                
-
-                        elif chart_name == "10. Line Graph of Manifold Absolute Pressure":
-                            if 'MAP_kPa' in data.columns and 'Timestamp' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=data['Timestamp'],
-                                    y=data['MAP_kPa'],
-                                    mode='lines',
-                                    marker=dict(size=7, color='purple'),
-                                    line=dict(width=3, color='purple'),
-                                    name='ضغط مشعب السحب'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="ضغط الهواء داخل مشعب السحب (MAP_kPa)",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="الضغط (كيلو باسكال)",
-                                    template="plotly_white",
-                                    height=400,
-                                    xaxis=dict(tickangle=45)
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود MAP_kPa غير موجود في البيانات")
-
-                        elif chart_name == "11. Line Graph of Mass Air Flow":
-                            if 'MAF_gps' in data.columns and 'Timestamp' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=data['Timestamp'],
-                                    y=data['MAF_gps'],
-                                    mode='lines',
-                                    marker=dict(size=7, color='green'),
-                                    line=dict(width=3, color='green'),
-                                    name='تدفق كتلة الهواء'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="💨 تدفق كتلة الهواء (جرام/ثانية)",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="تدفق كتلة الهواء (جرام/ثانية)",
-                                    template="plotly_white",
-                                    height=400,
-                                    xaxis=dict(tickangle=45)
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود MAF_gps غير موجود في البيانات")
-
-                        elif chart_name == "12. 3D Scatter Plot of Engine Parameters":
-                            if all(col in data.columns for col in ['Engine_RPM', 'Ignition_Timing_Deg', 'MAP_kPa', 'MAF_gps']):
-                                fig = px.scatter_3d(
-                                    data_frame=data,
-                                    x="Engine_RPM",
-                                    y="Ignition_Timing_Deg",
-                                    z="MAP_kPa",
-                                    color="MAF_gps",
-                                    title="عرض ثلاثي الأبعاد: دورات المحرك مقابل توقيت الإشعال مقابل ضغط المشعب (ملون حسب تدفق الهواء)",
-                                    labels={
-                                        "Engine_RPM": "دورات المحرك (RPM)",
-                                        "Ignition_Timing_Deg": "توقيت الإشعال (درجة)",
-                                        "MAP_kPa": "ضغط المشعب (كيلو باسكال)",
-                                        "MAF_gps": "تدفق كتلة الهواء (جرام/ثانية)"
-                                    }
-                                )
-                                
-                                fig.update_layout(
-                                    height=600,
-                                    template="plotly_white"
-                                )
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("بعض الأعمدة المطلوبة غير موجودة في البيانات")
-
-                        elif chart_name == "13. Line Graph of Exhaust Gas Recirculation":
-                            if 'EGR_Status' in data.columns and 'Timestamp' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=data['Timestamp'],
-                                    y=data['EGR_Status'],
-                                    mode='lines',
-                                    marker=dict(size=7, color='royalblue'),
-                                    line=dict(width=3, color='royalblue'),
-                                    name='حالة EGR'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="حالة نظام إعادة تدوير غاز العادم (EGR)",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="حالة EGR (مشفرة)",
-                                    template="plotly_white",
-                                    height=400,
-                                    xaxis=dict(tickangle=45)
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود EGR_Status غير موجود في البيانات")
-
-                        elif chart_name == "14. Line Graph of Catalytic Converter Efficiency":
-                            if 'Catalytic_Converter_Percent' in data.columns and 'Timestamp' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=data['Timestamp'],
-                                    y=data['Catalytic_Converter_Percent'],
-                                    mode='lines',
-                                    marker=dict(size=7, color='teal'),
-                                    line=dict(width=3, color='teal'),
-                                    name='كفاءة المحول الحفاز'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="كفاءة عمل المحول الحفاز",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="كفاءة المحول الحفاز (%)",
-                                    template="plotly_white",
-                                    height=400,
-                                    xaxis=dict(tickangle=45)
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود Catalytic_Converter_Percent غير موجود في البيانات")
-
-                        elif chart_name == "15. Line Graph of Brake Status":
-                            if 'Brake_Status' in data.columns and 'Timestamp' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=data['Timestamp'],
-                                    y=data['Brake_Status'],
-                                    mode='lines',
-                                    marker=dict(size=7, color='royalblue'),
-                                    line=dict(width=3, color='royalblue'),
-                                    name='حالة الفرامل'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="حالة الفرامل",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="حالة الفرامل",
-                                    template="plotly_white",
-                                    height=400,
-                                    xaxis=dict(tickangle=45)
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود Brake_Status غير موجود في البيانات")
-
-                        elif chart_name == "16. Line Graph of Tire Pressure":
-                            if 'Tire_Pressure_psi' in data.columns and 'Timestamp' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=data['Timestamp'],
-                                    y=data['Tire_Pressure_psi'],
-                                    mode='lines',
-                                    marker=dict(size=7, color='indigo'),
-                                    line=dict(width=3, color='indigo'),
-                                    name='ضغط الإطارات'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="ضغط إطارات المركبة",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="ضغط الإطارات (PSI)",
-                                    template="plotly_white",
-                                    height=400,
-                                    xaxis=dict(tickangle=45)
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود Tire_Pressure_psi غير موجود في البيانات")
-
-                        elif chart_name == "17. Line Graph of Ambient Temperature":
-                            if 'Ambient_Temp_C' in data.columns and 'Timestamp' in data.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=data['Timestamp'],
-                                    y=data['Ambient_Temp_C'],
-                                    mode='lines',
-                                    marker=dict(size=7, color='goldenrod'),
-                                    line=dict(width=3, color='goldenrod'),
-                                    name='درجة الحرارة المحيطة'
-                                ))
-                                
-                                fig.update_layout(
-                                    title="درجة الحرارة المحيطة بالمركبة",
-                                    xaxis_title="الوقت",
-                                    yaxis_title="درجة الحرارة (°C)",
-                                    template="plotly_white",
-                                    height=400,
-                                    xaxis=dict(tickangle=45)
-                                )
-                                
-                                fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error("عمود Ambient_Temp_C غير موجود في البيانات")
+                            metrics.payload(chart_name, fig)
 
                         st.markdown('</div>', unsafe_allow_html=True)
-        else:
+            
+            if metrics.enabled:
+                metrics.log()
+                with st.expander("🛠 قياسات الأداء"):
+                    st.dataframe(metrics.stages(), use_container_width=True)
+                    st.dataframe(metrics.charts(), use_container_width=True)
+                    st.download_button(
+                        "تنزيل القياسات (JSON)",
+                        metrics.to_json(),
+                        file_name="dashboard_metrics.json",
+                        mime="application/json"
+                    )
+        elif not charts_to_show:
+            with file_info:
+                st.success("✅ تم رفع الملف !")
+                st.info("You can now choose which charts you want to view from the options below.")
             st.info("--Choose the charts you want to view--")
     
     except Exception as e:
@@ -0,0 +1,349 @@
+"""Benchmarks for the vehicle dashboard, run without a browser or a Streamlit server.
+
+Generates synthetic telemetry with the columns the charts use, then times
+ingestion, the build of every registered chart and the size of each figure
+as Streamlit would send it, and writes the results as JSON:
+
+    python benchmark.py --rows 10000 1000000 --output bench.json
+
+Generated files are kept in --data-dir (and reused on the next run), so large
+sizes are only written once. Use --generate-only to just write the files.
+
+--startup instead measures the app's cold start (a fresh interpreter running
+app2.py once, as on a new server process or worker):
+
+    python benchmark.py --startup
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+import plotly
+import plotly.io as pio
+import streamlit
+import streamlit.logger
+
+# the app's cached helpers run without a Streamlit server here; silence its bare-mode warnings.
+# Setting the option parses Streamlit's config, which resets the loggers to that option's
+# level, so the loggers are lowered afterwards as well.
+streamlit.config.set_option('logger.level', 'error')
+streamlit.logger.set_log_level('error')
+
+import telemetry
+from charts import CHARTS, SCATTER_3D_MAX_POINTS, WEBGL_POINT_THRESHOLD, build_figure, required_columns
+from ingest import IngestJob
+from telemetry import DEFAULT_MAX_POINTS, STREAMING_THRESHOLD_BYTES, TelemetryQuery, telemetry_stats
+
+GENERATE_CHUNK_ROWS = 1_000_000
+DEFAULT_ROWS = (10_000, 100_000, 1_000_000)
+DEFAULT_DAYS = 3
+
+
+def _walk(rng, n, start, step, low, high):
+    """Bounded random walk, so line charts look like sensor traces rather than noise."""
+    values = start + np.cumsum(rng.normal(0, step, n))
+    span = high - low
+    # reflect into [low, high] instead of clipping, which would flatten the trace
+    values = np.abs((values - low) % (2 * span) - span)
+    return high - values
+
+
+def _excursions(rng, n, count, length):
+    """Boolean mask of count runs of up to length rows, where a signal is pushed past its limit."""
+    mask = np.zeros(n, dtype=bool)
+    for start in rng.integers(0, max(n - 1, 1), size=count):
+        mask[start:start + int(rng.integers(1, length + 1))] = True
+    return mask
+
+
+def _push(rng, values, mask, low, high):
+    """Replace the masked rows of values with uniform draws from [low, high]."""
+    values[mask] = rng.uniform(low, high, size=int(mask.sum()))
+
+
+def telemetry_chunk(rng, timestamps):
+    """One chunk of synthetic telemetry with the columns of TELEMETRY_SCHEMA plus Timestamp.
+
+    RPM, coolant temperature, battery voltage and tire pressure include short
+    excursions past the limits the charts and stats highlight.
+    """
+    n = len(timestamps)
+    excursions = max(n // 20_000, 1)
+    rpm = _walk(rng, n, 2500, 40, 800, 6000)
+    _push(rng, rpm, _excursions(rng, n, excursions, 60), 6500, 7200)
+    coolant = _walk(rng, n, 90, 0.05, 75, 102)
+    _push(rng, coolant, _excursions(rng, n, excursions, 300), 105.5, 112)
+    battery = _walk(rng, n, 13.8, 0.005, 12.2, 14.6)
+    _push(rng, battery, _excursions(rng, n, excursions, 120), 10.8, 11.8)
+    tire = _walk(rng, n, 32, 0.002, 30, 35)
+    _push(rng, tire, _excursions(rng, n, max(excursions // 4, 1), 600), 22, 26)
+
+    columns = {
+        'Timestamp': timestamps,
+        'Engine_RPM': rpm.round(0),
+        'Engine_Load_Percent': _walk(rng, n, 35, 0.8, 0, 100).round(1),
+        'Coolant_Temp_C': coolant.round(1),
+        'Oil_Temp_C': _walk(rng, n, 95, 0.05, 70, 125).round(1),
+        'Battery_Voltage_V': battery.round(2),
+        'MAP_kPa': _walk(rng, n, 45, 0.6, 20, 105).round(1),
+        'MAF_gps': _walk(rng, n, 20, 0.5, 2, 220).round(1),
+        'Ignition_Timing_Deg': _walk(rng, n, 15, 0.3, -5, 40).round(1),
+        'EGR_Status': (rng.random(n) < 0.3).astype(np.int8),
+        'Catalytic_Converter_Percent': _walk(rng, n, 92, 0.05, 55, 100).round(1),
+        'Brake_Status': (rng.random(n) < 0.1).astype(np.int8),
+        'Tire_Pressure_psi': tire.round(1),
+        'Ambient_Temp_C': _walk(rng, n, 22, 0.01, -10, 45).round(1),
+    }
+    return pa.table(columns)
+
+
+def generate_telemetry(path, rows, days=DEFAULT_DAYS, seed=0):
+    """Write rows of synthetic telemetry spread evenly over days to path (.csv or .parquet)."""
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01T00:00:00', 'ms')
+    step = np.timedelta64(max(int(days * 86_400_000 // max(rows, 1)), 1), 'ms')
+    tmp = path.with_name(path.name + '.tmp')
+    writer = None
+    try:
+        for offset in range(0, rows, GENERATE_CHUNK_ROWS):
+            n = min(GENERATE_CHUNK_ROWS, rows - offset)
+            timestamps = start + step * np.arange(offset, offset + n)
+            table = telemetry_chunk(rng, timestamps)
+            if writer is None:
+                if path.suffix == '.parquet':
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                else:
+                    writer = pcsv.CSVWriter(tmp, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, path)
+    return path
+
+
+class LocalUpload(io.FileIO):
+    """A file on disk standing in for a Streamlit UploadedFile."""
+
+    @property
+    def size(self):
+        return os.fstat(self.fileno()).st_size
+
+    @property
+    def file_id(self):
+        return self.name
+
+    def getvalue(self):
+        self.seek(0)
+        return self.read()
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _ingest(digest, columns, chunked, upload):
+    """Parse an upload with an IngestJob as the app does; returns its result, the wall seconds and its stage timings."""
+    job = IngestJob(digest, columns, chunked, upload)
+    result, seconds = _timed(job.result)
+    return result, seconds, job.timings
+
+
+def chart_inputs(data, histograms, stats, events, rollups, digest, chunked):
+    """The chart_inputs the app builds with the default display settings, the full time window and the first day."""
+    query = TelemetryQuery(data, digest, chunked, histograms, rollups)
+    query = query.select(query.bounds(), next(iter(query.days()), None))
+    return dict(
+        query=query,
+        selected_day=query.day,
+        window=query.window,
+        stats=stats,
+        events=events,
+        max_points=DEFAULT_MAX_POINTS,
+        render_backend='auto',
+        webgl_threshold=WEBGL_POINT_THRESHOLD,
+        max_3d_points=SCATTER_3D_MAX_POINTS,
+    )
+
+
+def benchmark_file(path, chunked=None, charts=None):
+    """Time ingestion and every chart build for one file; returns a JSON-serializable dict."""
+    chart_names = list(charts or CHARTS)
+    columns = required_columns(chart_names)
+    with LocalUpload(path) as upload:
+        if chunked is None:
+            chunked = upload.size > STREAMING_THRESHOLD_BYTES
+        # a fresh key instead of the content hash, so every run starts from an empty column store
+        digest = f"bench-{time.time_ns()}"
+        (data, histograms, events, rollups), ingest_s, timings = _ingest(digest, columns, chunked, upload)
+        ingest_store_s = None
+        if not chunked and Path(path).suffix == '.csv':
+            # a second job for the same upload reads its columns back from the column store
+            _, ingest_store_s, _ = _ingest(digest, columns, chunked, upload)
+        file_bytes = upload.size
+    shutil.rmtree(telemetry.ColumnStore(digest).folder, ignore_errors=True)
+
+    stats, stats_s = _timed(telemetry_stats, digest, chunked, tuple(data.columns), data, histograms)
+    inputs = chart_inputs(data, histograms, stats, events, rollups, digest, chunked)
+
+    results = {}
+    for chart_name in chart_names:
+        fig, build_s = _timed(build_figure, chart_name, inputs)
+        if isinstance(fig, str):
+            results[chart_name] = {'error': fig}
+            continue
+        spec, serialize_s = _timed(pio.to_json, fig, False)
+        results[chart_name] = {
+            'build_s': round(build_s, 4),
+            'serialize_s': round(serialize_s, 4),
+            'bytes': len(spec.encode('utf-8')),
+            'traces': len(fig.data),
+        }
+    return {
+        'file': str(path),
+        'file_bytes': file_bytes,
+        'rows': max((s['count'] for s in stats.values()), default=len(data)),
+        'chunked': chunked,
+        'ingest_s': round(ingest_s, 4),
+        'ingest_stages_s': {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        'ingest_from_store_s': None if ingest_store_s is None else round(ingest_store_s, 4),
+        'stats_s': round(stats_s, 4),
+        'events_s': round(timings.get('events', 0.0), 4),
+        'events': len(events),
+        'rollups_s': round(timings.get('rollups', 0.0), 4),
+        'rollup_buckets': {name: len(level) for name, level in rollups.items()},
+        'loaded_rows': len(data),
+        'loaded_bytes': int(data.memory_usage(deep=True).sum()),
+        'charts': results,
+        'total_build_s': round(sum(r.get('build_s', 0) for r in results.values()), 4),
+        'total_bytes': sum(r.get('bytes', 0) for r in results.values()),
+    }
+
+
+STARTUP_RUNS = 5
+APP_PATH = Path(__file__).with_name('app2.py')
+# modules that used to be imported at startup without being needed for the first page
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'plotly.express', 'scipy', 'sklearn')
+STARTUP_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+from streamlit.testing.v1 import AppTest
+ready = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+done = time.perf_counter()
+print(json.dumps({
+    'streamlit_s': ready - start,
+    'first_run_s': done - ready,
+    'exceptions': len(at.exception),
+    'modules': len(sys.modules),
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': sorted(m for m in sys.argv[2:] if m in sys.modules),
+}))
+"""
+
+
+def benchmark_startup(runs=STARTUP_RUNS):
+    """Median cold start over runs fresh interpreters, each rendering app2.py once without an upload.
+
+    first_run_s covers the app's own imports and the first script run;
+    total_s is the wall time of the whole process, interpreter start included.
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, '-c', STARTUP_PROBE, str(APP_PATH), *HEAVY_MODULES],
+            cwd=APP_PATH.parent, capture_output=True, text=True, check=True,
+        )
+        samples.append({**json.loads(out.stdout.splitlines()[-1]), 'total_s': time.perf_counter() - start})
+    result = {
+        key: round(float(np.median([sample[key] for sample in samples])), 4)
+        for key in ('total_s', 'streamlit_s', 'first_run_s', 'max_rss_mb', 'modules')
+    }
+    result.update(runs=runs, exceptions=max(s['exceptions'] for s in samples), heavy_modules=samples[0]['heavy_modules'])
+    return result
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'plotly': plotly.__version__,
+        'streamlit': streamlit.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS),
+                        help='dataset sizes to generate and benchmark (up to 50M rows)')
+    parser.add_argument('--days', type=float, default=DEFAULT_DAYS, help='time span of each generated file')
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'telemetry-bench'))
+    parser.add_argument('--chunked', action=argparse.BooleanOptionalAction, default=None,
+                        help='force chunked ingestion on or off (default: by file size, as the app does)')
+    parser.add_argument('--chart', action='append', dest='charts', help='benchmark only this chart (repeatable)')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--generate-only', action='store_true')
+    parser.add_argument('--startup', action='store_true', help="measure the app's cold start instead")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        report = {'environment': environment(), 'startup': benchmark_startup()}
+        _write_report(report, args.output)
+        return
+
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    # keep the column store next to the generated files, out of the working tree
+    telemetry.CACHE_DIR = data_dir / 'store'
+
+    runs = []
+    for rows in args.rows:
+        path = data_dir / f"telemetry_{rows}_{args.days:g}d.{args.format}"
+        if not path.exists():
+            print(f"generating {path}", file=sys.stderr)
+            generate_telemetry(path, rows, args.days)
+        if args.generate_only:
+            continue
+        print(f"benchmarking {path}", file=sys.stderr)
+        runs.append(benchmark_file(path, args.chunked, args.charts))
+
+    if args.generate_only:
+        return
+    _write_report({'environment': environment(), 'runs': runs}, args.output)
+
+
+def _write_report(report, output):
+    report = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        Path(output).write_text(report, encoding='utf-8')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1062 @@
+"""Chart registry for the vehicle dashboard.
+
+Each chart is a builder function registered with register_chart, which
+declares the columns the chart reads and the display settings it depends on.
+The app builds its selection grid, column pruning and figure cache keys from
+the registry, so adding a chart only means adding a builder here.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+import multiprocessing
+import os
+import time
+from typing import Callable
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.subplots import make_subplots
+
+from telemetry import events_in_window, timestamp_bounds
+
+
+def histogram_bars(edges, counts, **trace_kwargs):
+    """go.Bar trace drawing precomputed histogram counts like go.Histogram would."""
+    edges = np.asarray(edges, dtype=float)
+    return go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        **trace_kwargs
+    )
+
+
+WEBGL_POINT_THRESHOLD = 10_000  # in auto mode, series longer than this are drawn with WebGL
+SCATTER_3D_MAX_POINTS = 20_000
+RENDER_BACKENDS = {'auto': 'تلقائي', 'svg': 'SVG', 'webgl': 'WebGL'}
+
+
+def scatter_class(n_points, backend, webgl_threshold):
+    """go.Scattergl when WebGL is forced, or in auto mode once a series passes webgl_threshold points."""
+    if backend == 'webgl' or (backend == 'auto' and n_points > webgl_threshold):
+        return go.Scattergl
+    return go.Scatter
+
+
+def threshold_line_traces(x, y, threshold, hot_color='orangered', cool_color='seagreen', width=3, trace_type=go.Scatter):
+    """Split a line into above/below-threshold runs, returned as two traces.
+
+    A segment is hot when either endpoint exceeds the threshold. Runs of the
+    same colour are separated by NaN gaps, so the trace count stays at two
+    regardless of how many rows the series has.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n < 2:
+        return [trace_type(x=x, y=y, mode='lines', line=dict(color=cool_color, width=width), showlegend=False)]
+
+    above = y > threshold
+    hot_segments = above[:-1] | above[1:]
+
+    traces = []
+    for segments, color in ((~hot_segments, cool_color), (hot_segments, hot_color)):
+        if not segments.any():
+            continue
+        # a point belongs to this trace if one of its adjacent segments does
+        keep_point = np.zeros(n, dtype=bool)
+        keep_point[:-1] |= segments
+        keep_point[1:] |= segments
+        # break the line after a kept point whose next segment has the other colour
+        keep_gap = np.zeros(n, dtype=bool)
+        keep_gap[:-1] = keep_point[:-1] & ~segments
+
+        # interleave [p0, gap0, p1, gap1, ...]; gaps repeat x and carry NaN in y
+        xs = np.repeat(x, 2)
+        ys = np.repeat(y, 2)
+        ys[1::2] = np.nan
+        keep = np.empty(2 * n, dtype=bool)
+        keep[0::2] = keep_point
+        keep[1::2] = keep_gap
+
+        traces.append(trace_type(
+            x=xs[keep],
+            y=ys[keep],
+            mode='lines',
+            line=dict(color=color, width=width),
+            connectgaps=False,
+            showlegend=False
+        ))
+    return traces
+
+
+SERIES_PARAMS = ('window', 'max_points', 'render_backend', 'webgl_threshold')
+DAY_PARAMS = ('selected_day',) + SERIES_PARAMS
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """A registered chart: its description, the columns it reads and the settings its figure depends on."""
+    name: str
+    description: str
+    columns: tuple
+    params: tuple
+    build: Callable
+
+    @property
+    def time_series(self):
+        """Whether the chart follows the shared time window (and can be zoomed by box selection)."""
+        return 'window' in self.params
+
+
+CHARTS = {}  # chart name -> ChartSpec, in registration (display) order
+
+
+def register_chart(name, description, columns, params=()):
+    """Register a figure builder under name.
+
+    The builder receives the chart_inputs dict and returns a go.Figure, or an
+    error message to show instead of the chart.
+    """
+    def decorator(build):
+        if name in CHARTS:
+            raise ValueError(f"chart {name!r} is already registered")
+        CHARTS[name] = ChartSpec(name, description, tuple(columns), tuple(params), build)
+        return build
+    return decorator
+
+
+@register_chart(
+    "1. Histogram of Engine RPM",
+    "رسم بياني يوضح توزيع دورات المحرك، مع تمييز الدورات العالية والمنخفضة",
+    columns=['Engine_RPM'],
+)
+def build_rpm_histogram(inputs):
+    query = inputs['query']
+
+    rpm_threshold = 6000
+    fig = go.Figure()
+
+    edges, counts = query.histogram('Engine_RPM', 50)
+    split = np.searchsorted(edges[:-1], rpm_threshold)
+    fig.add_trace(histogram_bars(
+        edges[:split + 1],
+        counts[:split],
+        name='دورات عادية',
+        marker_color='green',
+        opacity=0.75
+    ))
+    fig.add_trace(histogram_bars(
+        edges[split:],
+        counts[split:],
+        name='دورات عالية',
+        marker_color='red',
+        opacity=0.75
+    ))
+
+    fig.update_layout(
+        title='توزيع دورات المحرك',
+        xaxis_title='دورات المحرك (RPM)',
+        yaxis_title='العدد',
+        barmode='overlay',
+        template='plotly_white',
+        height=400,
+        legend=dict(title='فئة الدورات')
+    )
+    return fig
+
+
+@register_chart(
+    "2. Line Graph of Engine RPM over time",
+    "مخطط زمني يظهر تغيرات دورات المحرك مع الوقت، مع تمييز ملون للدورات العالية",
+    columns=['Timestamp', 'Engine_RPM'],
+    params=SERIES_PARAMS,
+)
+def build_rpm_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['Engine_RPM'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    traces = threshold_line_traces(view["Timestamp"], view["Engine_RPM"], 6500, trace_type=trace_type)
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title="دورات المحرك عبر الزمن",
+        xaxis_title="الوقت",
+        yaxis_title="دورات المحرك (RPM)",
+        xaxis=dict(
+            tickformat="%H:%M:%S",
+            tickangle=45
+        ),
+        template="plotly_white",
+        height=400
+    )
+
+    fig.update_xaxes(showgrid=True, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "3. Line Graph of Coolant Temperature",
+    "مخطط درجة حرارة سائل التبريد على مدار الزمن، مع خط تحذير عند 105 درجة مئوية",
+    columns=['Timestamp', 'Coolant_Temp_C'],
+    params=DAY_PARAMS,
+)
+def build_coolant_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    selected_day = inputs['selected_day']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    if selected_day is not None:
+        day = selected_day
+        day_data = query.series(['Coolant_Temp_C'], max_points, day=True)
+        trace_type = scatter_class(len(day_data), render_backend, webgl_threshold)
+
+        fig = go.Figure(data=threshold_line_traces(day_data['Timestamp'], day_data['Coolant_Temp_C'], 105, trace_type=trace_type))
+
+        fig.add_shape(
+            type='line',
+            xref='paper',
+            x0=0,
+            x1=1,
+            y0=105,
+            y1=105,
+            line=dict(color='red', width=2, dash='dash'),
+        )
+
+        fig.update_layout(
+            title=f'درجة حرارة سائل التبريد بتاريخ {day}',
+            xaxis_title='الوقت',
+            yaxis_title='درجة حرارة سائل التبريد (°C)',
+            xaxis=dict(tickangle=45),
+            template='plotly_white',
+            height=400,
+        )
+
+        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+        return fig
+    else:
+        return "لم يتم العثور على بيانات التاريخ"
+
+
+@register_chart(
+    "4. Histogram of Oil Temperature",
+    "رسم بياني يوضح توزيع درجات حرارة الزيت مع إظهار المتوسط والوسيط",
+    columns=['Oil_Temp_C'],
+)
+def build_oil_histogram(inputs):
+    query = inputs['query']
+    stats = inputs['stats']
+
+    if not stats['Oil_Temp_C']['count']:
+        return "لا توجد قيم لدرجة حرارة الزيت في البيانات"
+
+    fig = go.Figure()
+
+    edges, counts = query.histogram('Oil_Temp_C', 30)
+    oil_mean = stats['Oil_Temp_C']['mean']
+    oil_median = stats['Oil_Temp_C']['median']
+    fig.add_trace(histogram_bars(
+        edges,
+        counts,
+        marker_color='orange',
+        opacity=0.6,
+        name='توزيع درجة حرارة الزيت'
+    ))
+
+    fig.add_shape(
+        type='line',
+        x0=oil_mean,
+        x1=oil_mean,
+        y0=0,
+        y1=1,
+        yref='paper',
+        line=dict(color='blue', width=2, dash='dash'),
+        name='المتوسط'
+    )
+
+    fig.add_shape(
+        type='line',
+        x0=oil_median,
+        x1=oil_median,
+        y0=0,
+        y1=1,
+        yref='paper',
+        line=dict(color='green', width=2, dash='dash'),
+        name='الوسيط'
+    )
+
+    fig.update_layout(
+        title='توزيع درجة حرارة الزيت (°C)',
+        xaxis_title='درجة حرارة الزيت (°C)',
+        yaxis_title='التكرار',
+        template='plotly_white',
+        height=400,
+        legend=dict(
+            y=0.99,
+            x=0.01,
+            title_text=''
+        )
+    )
+
+    fig.add_annotation(
+        x=oil_mean,
+        y=0.95,
+        yref='paper',
+        text=f"المتوسط: {oil_mean:.1f}°C",
+        showarrow=True,
+        arrowhead=1,
+        ax=50,
+        ay=-30
+    )
+
+    fig.add_annotation(
+        x=oil_median,
+        y=0.85,
+        yref='paper',
+        text=f"الوسيط: {oil_median:.1f}°C",
+        showarrow=True,
+        arrowhead=1,
+        ax=-50,
+        ay=-30
+    )
+
+    return fig
+
+
+@register_chart(
+    "5. Line Graph of Oil Temperature",
+    "مخطط زمني يظهر تغيرات درجة حرارة الزيت على مدار اليوم",
+    columns=['Timestamp', 'Oil_Temp_C'],
+    params=DAY_PARAMS,
+)
+def build_oil_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    selected_day = inputs['selected_day']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    if selected_day is not None:
+        day = selected_day
+        day_data = query.series(['Oil_Temp_C'], max_points, day=True)
+        trace_type = scatter_class(len(day_data), render_backend, webgl_threshold)
+
+        fig = go.Figure()
+
+        fig.add_trace(
+            trace_type(
+                x=day_data['Timestamp'],
+                y=day_data['Oil_Temp_C'],
+                mode='lines+markers',
+                line=dict(color='darkorange', width=3),
+                name='درجة حرارة الزيت'
+            )
+        )
+
+        fig.update_layout(
+            title=f'درجة حرارة الزيت (°C) بتاريخ {day}',
+            xaxis_title='الوقت',
+            yaxis_title='درجة حرارة الزيت (°C)',
+            xaxis=dict(tickangle=50),
+            template='plotly_white',
+            height=400,
+        )
+
+        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+        return fig
+    else:
+        return "لم يتم العثور على بيانات التاريخ"
+
+
+@register_chart(
+    "6. Line Graph of Engine RPM and Oil Temperature",
+    "مخطط مزدوج يظهر العلاقة بين دورات المحرك ودرجة حرارة الزيت",
+    columns=['Timestamp', 'Engine_RPM', 'Oil_Temp_C'],
+    params=SERIES_PARAMS,
+)
+def build_rpm_oil_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['Engine_RPM', 'Oil_Temp_C'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    fig.add_trace(
+        trace_type(
+            x=view["Timestamp"],
+            y=view["Engine_RPM"],
+            mode='lines+markers',
+            name='دورات المحرك',
+            line=dict(color='darkgreen', width=3),
+            marker=dict(size=7)
+        ),
+        secondary_y=False
+    )
+
+    fig.add_trace(
+        trace_type(
+            x=view["Timestamp"],
+            y=view["Oil_Temp_C"],
+            mode='lines+markers',
+            name='درجة حرارة الزيت',
+            line=dict(color='darkorange', width=3),
+            marker=dict(size=7)
+        ),
+        secondary_y=True
+    )
+
+    fig.update_layout(
+        title="العلاقة بين دورات المحرك ودرجة حرارة الزيت",
+        xaxis_title="الوقت",
+        template="plotly_white",
+        height=400,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+
+    fig.update_yaxes(title_text="دورات المحرك (RPM)", secondary_y=False, color="darkgreen")
+    fig.update_yaxes(title_text="درجة حرارة الزيت (°C)", secondary_y=True, color="darkorange")
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "7. Line Graph of Engine Load Percent & RPM",
+    "مخطط مزدوج يظهر العلاقة بين حمل المحرك ودوراته",
+    columns=['Timestamp', 'Engine_RPM', 'Engine_Load_Percent'],
+    params=SERIES_PARAMS,
+)
+def build_load_rpm_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['Engine_RPM', 'Engine_Load_Percent'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    fig.add_trace(
+        trace_type(
+            x=view["Timestamp"],
+            y=view["Engine_RPM"],
+            mode='lines',
+            name='دورات المحرك',
+            line=dict(color='chocolate', width=3),
+        ),
+        secondary_y=False
+    )
+
+    fig.add_trace(
+        trace_type(
+            x=view["Timestamp"],
+            y=view["Engine_Load_Percent"],
+            mode='lines',
+            name='حمل المحرك (%)',
+            line=dict(color='blue', width=3),
+        ),
+        secondary_y=True
+    )
+
+    fig.update_layout(
+        title="العلاقة بين دورات المحرك ونسبة الحمل",
+        xaxis_title="الوقت",
+        template="plotly_white",
+        height=400,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+
+    fig.update_yaxes(title_text="دورات المحرك (RPM)", secondary_y=False, color="chocolate")
+    fig.update_yaxes(title_text="نسبة حمل المحرك (%)", secondary_y=True, color="blue")
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "8. Histogram of Battery Voltage",
+    "رسم بياني يوضح توزيع قيم جهد البطارية",
+    columns=['Battery_Voltage_V'],
+)
+def build_battery_histogram(inputs):
+    query = inputs['query']
+
+    fig = go.Figure()
+
+    edges, counts = query.histogram('Battery_Voltage_V', 30)
+    fig.add_trace(histogram_bars(
+        edges,
+        counts,
+        marker_color='green',
+        opacity=0.75,
+        name='توزيع جهد البطارية'
+    ))
+
+    fig.update_layout(
+        title="توزيع جهد البطارية",
+        xaxis_title="جهد البطارية (فولت)",
+        yaxis_title="التكرار",
+        template="plotly_white",
+        height=400
+    )
+
+    return fig
+
+
+@register_chart(
+    "9. Line Graph of Battery Voltage",
+    "مخطط زمني يظهر تغيرات جهد البطارية على مدار اليوم",
+    columns=['Timestamp', 'Battery_Voltage_V'],
+    params=DAY_PARAMS,
+)
+def build_battery_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    selected_day = inputs['selected_day']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    if selected_day is not None:
+        day = selected_day
+        day_data = query.series(['Battery_Voltage_V'], max_points, day=True)
+        trace_type = scatter_class(len(day_data), render_backend, webgl_threshold)
+
+        fig = go.Figure()
+
+        fig.add_trace(
+            trace_type(
+                x=day_data['Timestamp'],
+                y=day_data['Battery_Voltage_V'],
+                mode='lines+markers',
+                line=dict(color='teal', width=3),
+                name='جهد البطارية'
+            )
+        )
+
+        fig.update_layout(
+            title=f'جهد البطارية بتاريخ {day}',
+            xaxis_title='الوقت',
+            yaxis_title='جهد البطارية (فولت)',
+            xaxis=dict(tickangle=50),
+            template='plotly_white',
+            height=400,
+        )
+
+        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+        return fig
+    else:
+        return "لم يتم العثور على بيانات التاريخ"
+
+
+@register_chart(
+    "10. Line Graph of Manifold Absolute Pressure",
+    "مخطط ضغط الهواء داخل مشعب السحب (MAP) مقاساً بالكيلو باسكال",
+    columns=['Timestamp', 'MAP_kPa'],
+    params=SERIES_PARAMS,
+)
+def build_map_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['MAP_kPa'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = go.Figure()
+
+    fig.add_trace(trace_type(
+        x=view['Timestamp'],
+        y=view['MAP_kPa'],
+        mode='lines',
+        marker=dict(size=7, color='purple'),
+        line=dict(width=3, color='purple'),
+        name='ضغط مشعب السحب'
+    ))
+
+    fig.update_layout(
+        title="ضغط الهواء داخل مشعب السحب (MAP_kPa)",
+        xaxis_title="الوقت",
+        yaxis_title="الضغط (كيلو باسكال)",
+        template="plotly_white",
+        height=400,
+        xaxis=dict(tickangle=45)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "11. Line Graph of Mass Air Flow",
+    "مخطط زمني لتدفق كتلة الهواء (MAF) مقاساً بالجرام في الثانية",
+    columns=['Timestamp', 'MAF_gps'],
+    params=SERIES_PARAMS,
+)
+def build_maf_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['MAF_gps'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = go.Figure()
+
+    fig.add_trace(trace_type(
+        x=view['Timestamp'],
+        y=view['MAF_gps'],
+        mode='lines',
+        marker=dict(size=7, color='green'),
+        line=dict(width=3, color='green'),
+        name='تدفق كتلة الهواء'
+    ))
+
+    fig.update_layout(
+        title="💨 تدفق كتلة الهواء (جرام/ثانية)",
+        xaxis_title="الوقت",
+        yaxis_title="تدفق كتلة الهواء (جرام/ثانية)",
+        template="plotly_white",
+        height=400,
+        xaxis=dict(tickangle=45)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "12. 3D Scatter Plot of Engine Parameters",
+    "رسم ثلاثي الأبعاد يوضح العلاقة بين دورات المحرك وتوقيت الإشعال وضغط مشعب السحب",
+    columns=['Engine_RPM', 'Ignition_Timing_Deg', 'MAP_kPa', 'MAF_gps'],
+    params=('max_3d_points',),
+)
+def build_engine_3d_scatter(inputs):
+    # plotly.express takes longer to import than the rest of plotly; only this chart uses it
+    import plotly.express as px
+
+    query = inputs['query']
+    max_3d_points = inputs['max_3d_points']
+
+    fig = px.scatter_3d(
+        data_frame=query.sample(['Engine_RPM', 'Ignition_Timing_Deg', 'MAP_kPa', 'MAF_gps'], max_3d_points),
+        x="Engine_RPM",
+        y="Ignition_Timing_Deg",
+        z="MAP_kPa",
+        color="MAF_gps",
+        title="عرض ثلاثي الأبعاد: دورات المحرك مقابل توقيت الإشعال مقابل ضغط المشعب (ملون حسب تدفق الهواء)",
+        labels={
+            "Engine_RPM": "دورات المحرك (RPM)",
+            "Ignition_Timing_Deg": "توقيت الإشعال (درجة)",
+            "MAP_kPa": "ضغط المشعب (كيلو باسكال)",
+            "MAF_gps": "تدفق كتلة الهواء (جرام/ثانية)"
+        }
+    )
+
+    fig.update_layout(
+        height=600,
+        template="plotly_white"
+    )
+
+    return fig
+
+
+@register_chart(
+    "13. Line Graph of Exhaust Gas Recirculation",
+    "مخطط زمني لحالة نظام إعادة تدوير غاز العادم (EGR)",
+    columns=['Timestamp', 'EGR_Status'],
+    params=SERIES_PARAMS,
+)
+def build_egr_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['EGR_Status'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = go.Figure()
+
+    fig.add_trace(trace_type(
+        x=view['Timestamp'],
+        y=view['EGR_Status'],
+        mode='lines',
+        marker=dict(size=7, color='royalblue'),
+        line=dict(width=3, color='royalblue'),
+        name='حالة EGR'
+    ))
+
+    fig.update_layout(
+        title="حالة نظام إعادة تدوير غاز العادم (EGR)",
+        xaxis_title="الوقت",
+        yaxis_title="حالة EGR (مشفرة)",
+        template="plotly_white",
+        height=400,
+        xaxis=dict(tickangle=45)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "14. Line Graph of Catalytic Converter Efficiency",
+    "مخطط زمني يوضح كفاءة عمل المحول الحفاز",
+    columns=['Timestamp', 'Catalytic_Converter_Percent'],
+    params=SERIES_PARAMS,
+)
+def build_catalyst_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['Catalytic_Converter_Percent'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = go.Figure()
+
+    fig.add_trace(trace_type(
+        x=view['Timestamp'],
+        y=view['Catalytic_Converter_Percent'],
+        mode='lines',
+        marker=dict(size=7, color='teal'),
+        line=dict(width=3, color='teal'),
+        name='كفاءة المحول الحفاز'
+    ))
+
+    fig.update_layout(
+        title="كفاءة عمل المحول الحفاز",
+        xaxis_title="الوقت",
+        yaxis_title="كفاءة المحول الحفاز (%)",
+        template="plotly_white",
+        height=400,
+        xaxis=dict(tickangle=45)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "15. Line Graph of Brake Status",
+    "مخطط زمني يوضح حالة الفرامل",
+    columns=['Timestamp', 'Brake_Status'],
+    params=SERIES_PARAMS,
+)
+def build_brake_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['Brake_Status'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = go.Figure()
+
+    fig.add_trace(trace_type(
+        x=view['Timestamp'],
+        y=view['Brake_Status'],
+        mode='lines',
+        marker=dict(size=7, color='royalblue'),
+        line=dict(width=3, color='royalblue'),
+        name='حالة الفرامل'
+    ))
+
+    fig.update_layout(
+        title="حالة الفرامل",
+        xaxis_title="الوقت",
+        yaxis_title="حالة الفرامل",
+        template="plotly_white",
+        height=400,
+        xaxis=dict(tickangle=45)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "16. Line Graph of Tire Pressure",
+    "مخطط زمني يوضح ضغط الإطارات بالـ PSI",
+    columns=['Timestamp', 'Tire_Pressure_psi'],
+    params=SERIES_PARAMS,
+)
+def build_tire_pressure_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['Tire_Pressure_psi'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = go.Figure()
+
+    fig.add_trace(trace_type(
+        x=view['Timestamp'],
+        y=view['Tire_Pressure_psi'],
+        mode='lines',
+        marker=dict(size=7, color='indigo'),
+        line=dict(width=3, color='indigo'),
+        name='ضغط الإطارات'
+    ))
+
+    fig.update_layout(
+        title="ضغط إطارات المركبة",
+        xaxis_title="الوقت",
+        yaxis_title="ضغط الإطارات (PSI)",
+        template="plotly_white",
+        height=400,
+        xaxis=dict(tickangle=45)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+@register_chart(
+    "17. Line Graph of Ambient Temperature",
+    "مخطط زمني يوضح درجة الحرارة المحيطة بالمركبة",
+    columns=['Timestamp', 'Ambient_Temp_C'],
+    params=SERIES_PARAMS,
+)
+def build_ambient_temp_line(inputs):
+    query = inputs['query']
+    max_points = inputs['max_points']
+    render_backend = inputs['render_backend']
+    webgl_threshold = inputs['webgl_threshold']
+
+    view = query.series(['Ambient_Temp_C'], max_points)
+    trace_type = scatter_class(len(view), render_backend, webgl_threshold)
+    fig = go.Figure()
+
+    fig.add_trace(trace_type(
+        x=view['Timestamp'],
+        y=view['Ambient_Temp_C'],
+        mode='lines',
+        marker=dict(size=7, color='goldenrod'),
+        line=dict(width=3, color='goldenrod'),
+        name='درجة الحرارة المحيطة'
+    ))
+
+    fig.update_layout(
+        title="درجة الحرارة المحيطة بالمركبة",
+        xaxis_title="الوقت",
+        yaxis_title="درجة الحرارة (°C)",
+        template="plotly_white",
+        height=400,
+        xaxis=dict(tickangle=45)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+
+    return fig
+
+
+
+def required_columns(chart_names):
+    """Sorted union of the columns needed by the given charts."""
+    return tuple(sorted({col for name in chart_names for col in CHARTS[name].columns}))
+
+
+def build_figure(chart_name, inputs):
+    """Build one chart's figure, or return an error message when its data is missing."""
+    spec = CHARTS[chart_name]
+    missing = [col for col in spec.columns if col not in inputs['query'].columns]
+    if len(missing) == 1:
+        return f"عمود {missing[0]} غير موجود في البيانات"
+    if missing:
+        return "بعض الأعمدة المطلوبة غير موجودة في البيانات"
+    fig = spec.build(inputs)
+    if isinstance(fig, go.Figure) and spec.time_series:
+        rows = inputs['query'].rows(day='selected_day' in spec.params)
+        add_event_overlay(fig, inputs.get('events'), spec.columns, rows)
+    return fig
+
+
+EVENT_OVERLAY_MAX = 200  # more events than this in view are left to the event table
+
+
+def add_event_overlay(fig, events, columns, rows):
+    """Shade the events of the chart's columns that fall within the time span of the plotted rows."""
+    bounds = timestamp_bounds(rows) if events is not None else None
+    if bounds is None:
+        return
+    shown = events_in_window(events, *bounds)
+    shown = shown[shown['column'].isin(columns)]
+    if shown.empty or len(shown) > EVENT_OVERLAY_MAX:
+        return
+    shapes = [
+        dict(
+            type='rect', xref='x', yref='paper',
+            x0=max(start, bounds[0]), x1=min(end, bounds[1]), y0=0, y1=1,
+            fillcolor='orangered', opacity=0.15, line=dict(width=1, color='orangered'), layer='below'
+        )
+        for start, end in zip(shown['start'], shown['end'])
+    ]
+    fig.update_layout(shapes=list(fig.layout.shapes) + shapes)
+
+
+FIGURE_CACHE_SIZE = 64  # built figures kept across reruns and sessions
+# point limits that leave a figure's size unbounded when set to None ("show raw data")
+POINT_LIMIT_PARAMS = ('max_points', 'max_3d_points')
+
+
+def _interactive_figure(chart_name, inputs):
+    fig = build_figure(chart_name, inputs)
+    if isinstance(fig, go.Figure) and CHARTS[chart_name].time_series:
+        fig.update_layout(dragmode='select', selectdirection='h')
+    return fig
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE, show_spinner=False)
+def _figure_slot(key):
+    """Holder of one cached figure, filled in by the first run that builds it."""
+    return {}
+
+
+def figure_key(chart_name, inputs):
+    """Figure cache key: the loaded dataset, the chart and the settings it depends on.
+
+    None for figures without a point limit, which can hold every row of the
+    upload and are therefore built on each run instead of being kept in the
+    shared cache.
+    """
+    params = CHARTS[chart_name].params
+    if any(name in params and inputs[name] is None for name in POINT_LIMIT_PARAMS):
+        return None
+    query = inputs['query']
+    return (
+        query.digest,
+        query.chunked,
+        tuple(query.columns),
+        chart_name,
+        tuple(inputs[name] for name in params),
+    )
+
+
+def chart_figure(chart_name, inputs):
+    """Memoized build_figure, keyed by figure_key().
+
+    Reruns that leave a chart's inputs unchanged reuse the figure built
+    earlier; least recently used figures are evicted past FIGURE_CACHE_SIZE.
+    The returned figure is shared, so callers must not modify it.
+    """
+    key = figure_key(chart_name, inputs)
+    if key is None:
+        return _interactive_figure(chart_name, inputs)
+    slot = _figure_slot(key)
+    if 'figure' not in slot:
+        slot['figure'] = _interactive_figure(chart_name, inputs)
+    return slot['figure']
+
+
+MAX_FIGURE_WORKERS = os.cpu_count() or 1
+DEFAULT_FIGURE_WORKERS = min(8, MAX_FIGURE_WORKERS)
+_worker_inputs = None  # the chart inputs of a figure worker process
+
+
+def _set_worker_inputs(inputs):
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+def _build_in_worker(chart_name):
+    """Build one figure in a worker; returns it as a plain dict (or the error message) and the seconds taken."""
+    start = time.perf_counter()
+    fig = _interactive_figure(chart_name, _worker_inputs)
+    if isinstance(fig, go.Figure):
+        fig = fig.to_plotly_json()
+    return fig, time.perf_counter() - start
+
+
+def figure_pool(workers, inputs):
+    """Pool of forked processes building figures from the given chart inputs.
+
+    Forking hands the loaded frames to the workers without pickling or
+    copying them; only the finished figures travel back, as dicts of numpy
+    arrays.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=_set_worker_inputs,
+        initargs=(inputs,),
+    )
+
+
+def chart_figures(chart_names, inputs, workers=DEFAULT_FIGURE_WORKERS, metrics=None):
+    """chart_figure for several charts, in the order of chart_names.
+
+    The figures missing from the cache are built at the same time on a pool
+    of worker processes: most of a build is Plotly's pure-Python figure
+    construction, which holds the GIL, so threads would not overlap. The
+    finished figures are reassembled without validating them a second time.
+    With one worker, or where fork is unavailable (Windows), they are built
+    one after the other on the calling thread. Each build is timed as a
+    'build' stage when a RunMetrics is given.
+    """
+    keys = [figure_key(chart_name, inputs) for chart_name in chart_names]
+    slots = [{} if key is None else _figure_slot(key) for key in keys]
+    missing = [i for i, slot in enumerate(slots) if 'figure' not in slot]
+    workers = min(workers, len(missing))
+
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with figure_pool(workers, inputs) as pool:
+            futures = {i: pool.submit(_build_in_worker, chart_names[i]) for i in missing}
+            for i, future in futures.items():
+                fig, seconds = future.result()
+                slots[i]['figure'] = go.Figure(fig, _validate=False) if isinstance(fig, dict) else fig
+                if metrics is not None:
+                    metrics.record('build', seconds, chart_names[i])
+    else:
+        for i in missing:
+            with metrics.stage('build', chart_names[i]) if metrics is not None else nullcontext():
+                slots[i]['figure'] = _interactive_figure(chart_names[i], inputs)
+
+    return [slot['figure'] for slot in slots]
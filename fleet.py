@@ -0,0 +1,219 @@
+"""Fleet mode: per-vehicle aggregates over many uploads, computed chunk by chunk.
+
+Each upload is reduced to a VehicleSummary (a StreamingHistogram per signal,
+the event table and the time span) without keeping its rows, so comparing
+dozens of logs costs a few kilobytes per vehicle rather than the logs' size.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+from pathlib import Path
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from telemetry import (
+    EVENT_LABELS,
+    EVENT_RULES,
+    EVENT_SIGNALS,
+    StreamingHistogram,
+    UPPER_THRESHOLDS,
+    detect_events,
+    index_events,
+    merge_events,
+    parse_timestamps,
+    reduce_upload_chunks,
+    upload_digest,
+)
+
+
+FLEET_COLUMNS = EVENT_SIGNALS + ('Engine_Load_Percent', 'Oil_Temp_C')
+FLEET_SIGNALS = {
+    'Engine_RPM': 'دورات المحرك (RPM)',
+    'Engine_Load_Percent': 'حمل المحرك (%)',
+    'Coolant_Temp_C': 'درجة حرارة سائل التبريد (°C)',
+    'Oil_Temp_C': 'درجة حرارة الزيت (°C)',
+    'Battery_Voltage_V': 'جهد البطارية (V)',
+    'Tire_Pressure_psi': 'ضغط الإطارات (PSI)',
+}
+MAX_CACHED_VEHICLES = 64  # summaries are a few kilobytes each, so a whole fleet stays cached
+FLEET_WORKERS = min(8, os.cpu_count() or 1)  # uploads read at the same time
+
+
+class VehicleSummary:
+    """Everything fleet mode needs from one log, accumulated one chunk at a time."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.event_chunks = []
+        self.events = None
+        self.rows = 0
+        self.start = None
+        self.end = None
+
+    def update(self, chunk):
+        if 'Timestamp' in chunk.columns and parse_timestamps(chunk):
+            first, last = chunk['Timestamp'].min(), chunk['Timestamp'].max()
+            if pd.notna(first):
+                self.start = first if self.start is None else min(self.start, first)
+                self.end = last if self.end is None else max(self.end, last)
+        for col in chunk.columns:
+            if col != 'Timestamp' and pd.api.types.is_numeric_dtype(chunk[col]):
+                if col not in self.histograms:
+                    self.histograms[col] = StreamingHistogram(thresholds=UPPER_THRESHOLDS.get(col, ()))
+                self.histograms[col].update(chunk[col])
+        self.event_chunks.append(detect_events(chunk, self.rows))
+        self.rows += len(chunk)
+
+    def finish(self):
+        self.events = index_events(merge_events(self.event_chunks))
+        self.event_chunks = []
+        return self
+
+    def stats(self):
+        return {col: histogram.stats() for col, histogram in self.histograms.items()}
+
+
+def _summarize(chunks):
+    summary = VehicleSummary()
+    for chunk, _ in chunks:
+        summary.update(chunk)
+    return summary.finish()
+
+
+@st.cache_resource(max_entries=MAX_CACHED_VEHICLES, show_spinner=False)
+def vehicle_summary(digest, columns, _uploaded_file):
+    """VehicleSummary of one upload, computed once per content hash."""
+    return reduce_upload_chunks(digest, columns, _uploaded_file, _summarize)
+
+
+def session_thread_pool(workers, thread_name_prefix):
+    """ThreadPoolExecutor whose threads share the current session's script run context.
+
+    Cached functions and session state then behave in the workers as they do
+    on the script thread.
+    """
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix=thread_name_prefix,
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+
+
+def vehicle_names(uploaded_files):
+    """A display name per upload: the file name without extension, numbered when names repeat."""
+    names, seen = [], {}
+    for uploaded_file in uploaded_files:
+        name = Path(uploaded_file.name).stem
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return names
+
+
+def fleet_summaries(uploaded_files, workers=FLEET_WORKERS):
+    """{vehicle name: VehicleSummary}, ingesting the uploads in parallel.
+
+    The progress bar is driven from the script thread as summaries complete;
+    already cached uploads return immediately.
+    """
+    names = vehicle_names(uploaded_files)
+    digests = [upload_digest(uploaded_file) for uploaded_file in uploaded_files]
+    summaries = {}
+    progress = st.progress(0.0, text="جاري تحليل ملفات الأسطول...")
+    with session_thread_pool(max(1, min(workers, len(uploaded_files))), 'vehicle_summary') as pool:
+        futures = {
+            pool.submit(vehicle_summary, digest, FLEET_COLUMNS, uploaded_file): name
+            for name, digest, uploaded_file in zip(names, digests, uploaded_files)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            summaries[futures[future]] = future.result()
+            progress.progress(done / len(futures), text=f"جاري تحليل ملفات الأسطول... ({done}/{len(futures)})")
+    progress.empty()
+    return {name: summaries[name] for name in names}
+
+
+def fleet_table(summaries):
+    """One row per vehicle: rows, time span, key signal statistics and event counts."""
+    rows = {}
+    for name, summary in summaries.items():
+        stats = summary.stats()
+        row = {
+            'rows': summary.rows,
+            'start': summary.start,
+            'end': summary.end,
+            'hours': (summary.end - summary.start) / pd.Timedelta(hours=1) if summary.start is not None else np.nan,
+        }
+        for col, key in (('Engine_RPM', 'mean'), ('Engine_RPM', 'p95'), ('Engine_RPM', 'max'),
+                         ('Coolant_Temp_C', 'max'), ('Battery_Voltage_V', 'min'), ('Tire_Pressure_psi', 'min')):
+            row[f'{col} {key}'] = stats.get(col, {}).get(key, np.nan)
+        counts = summary.events['event'].value_counts()
+        for event, _, _, _ in EVENT_RULES:
+            row[EVENT_LABELS[event]] = int(counts.get(event, 0))
+        rows[name] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def signal_distribution_figure(summaries, column):
+    """Box per vehicle drawn from the streamed quantiles (p5-p95 whiskers, min/max as points)."""
+    fig = go.Figure()
+    for name, summary in summaries.items():
+        if column not in summary.histograms:
+            continue
+        stats = summary.histograms[column].stats()
+        if not stats.get('count'):
+            continue
+        fig.add_trace(go.Box(
+            name=name,
+            q1=[stats['p25']],
+            median=[stats['median']],
+            q3=[stats['p75']],
+            lowerfence=[stats['p5']],
+            upperfence=[stats['p95']],
+            mean=[stats['mean']],
+            boxpoints=False,
+            showlegend=False,
+        ))
+        fig.add_trace(go.Scatter(
+            x=[name, name],
+            y=[stats['min'], stats['max']],
+            mode='markers',
+            marker=dict(color='gray', size=6, symbol='line-ew-open'),
+            showlegend=False,
+            hovertemplate='%{y}<extra>min / max</extra>',
+        ))
+    for threshold in UPPER_THRESHOLDS.get(column, ()):
+        fig.add_hline(y=threshold, line_dash='dash', line_color='red', annotation_text=f'{threshold:g}')
+    fig.update_layout(
+        title=f"توزيع {FLEET_SIGNALS.get(column, column)} لكل مركبة",
+        xaxis_title="المركبة",
+        yaxis_title=FLEET_SIGNALS.get(column, column),
+        plot_bgcolor='white',
+        height=450,
+    )
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    return fig
+
+
+def fleet_events_figure(summaries):
+    """Grouped bars of the event counts of each vehicle."""
+    names = list(summaries)
+    counts = {name: summary.events['event'].value_counts() for name, summary in summaries.items()}
+    fig = go.Figure([
+        go.Bar(name=EVENT_LABELS[event], x=names, y=[int(counts[name].get(event, 0)) for name in names])
+        for event, _, _, _ in EVENT_RULES
+    ])
+    fig.update_layout(
+        title="عدد الأحداث لكل مركبة",
+        barmode='group',
+        xaxis_title="المركبة",
+        yaxis_title="عدد الأحداث",
+        plot_bgcolor='white',
+        height=450,
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+    )
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgrey')
+    return fig
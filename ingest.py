@@ -0,0 +1,274 @@
+"""Background ingestion: parse an upload on a worker thread while the page keeps rendering.
+
+An IngestJob reads a preview (the header and the first rows) first, then the
+whole upload. The script only polls it, so the chart grid, the file info and
+early statistics show within seconds while a multi-gigabyte file is still
+being parsed, and the charts fill in once the data is ready.
+
+Jobs live in one process-wide DatasetStore keyed by content hash, so every
+session that opens the same log shares one parsed, read-only copy of it.
+"""
+from collections import OrderedDict
+import io
+import os
+import threading
+import time
+import weakref
+
+import pandas as pd
+import streamlit as st
+
+from telemetry import (
+    EVENT_SIGNALS,
+    build_rollups,
+    combine_rollups,
+    detect_events,
+    frame_stats,
+    index_events,
+    preview_telemetry,
+    read_telemetry,
+    read_telemetry_chunked,
+)
+
+
+INGEST_POLL_SECONDS = 0.5  # how often the page checks a running job
+# memory for loaded datasets no session is showing, e.g. DASHBOARD_DATASET_MEMORY_MB=8192 streamlit run app2.py
+DATASET_MEMORY_BYTES = int(float(os.environ.get('DASHBOARD_DATASET_MEMORY_MB', 2048)) * 1024 ** 2)
+
+_upload_locks = {}
+_upload_locks_guard = threading.Lock()
+
+
+def _upload_lock(digest):
+    """One ingestion per upload at a time: jobs for different column sets share its ColumnStore folder."""
+    with _upload_locks_guard:
+        return _upload_locks.setdefault(digest, threading.Lock())
+
+
+class UploadView(io.BytesIO):
+    """A private read position over an upload's bytes, so the worker never moves the session's file.
+
+    BytesIO shares the (immutable) bytes it is created from, so this does not
+    copy the upload.
+    """
+
+    def __init__(self, uploaded_file):
+        super().__init__(uploaded_file.getvalue())
+        self.name = uploaded_file.name
+        self.size = uploaded_file.size
+        self.file_id = uploaded_file.file_id
+
+
+class IngestJob:
+    """The parse of one upload, running on a daemon thread.
+
+    The script polls `done`, `fraction()`, `status` and `preview`; `result()`
+    returns (data, histograms, events, rollups) like the chunked loader, or
+    raises the worker's exception. `timings` holds the seconds spent in each
+    stage on the worker and `nbytes` the memory of what the job itself loaded.
+
+    A full-mode job started by a `store` asks it for a finished job of the
+    same upload to extend once it holds the upload's lock, so a job queued
+    behind a running parse of that upload can use its result. It then only
+    reads the columns the `base` lacks and shares the base's arrays for the rest.
+    """
+
+    def __init__(self, digest, columns, chunked, uploaded_file, store=None):
+        self.digest = digest
+        self.columns = columns
+        self.chunked = chunked
+        self.store = store
+        self.base = None
+        self.size = max(uploaded_file.size, 1)
+        self.status = "جاري قراءة أول الصفوف..."
+        self.preview = None
+        self.preview_stats = None
+        self.timings = {}
+        self.nbytes = 0
+        self._upload = UploadView(uploaded_file)
+        self._fraction = 0.0
+        self._result = None
+        self._error = None
+        self._done = threading.Event()
+        threading.Thread(target=self._run, name=f"ingest-{digest[:12]}", daemon=True).start()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def failed(self):
+        return self._error is not None
+
+    def progress(self, fraction, text=None):
+        """Same call as st.progress(), so the chunked reader can report to the job."""
+        self._fraction = fraction
+        if text:
+            self.status = text
+
+    def fraction(self):
+        """Share of the upload read so far; a full read is followed through the file position."""
+        if self.done:
+            return 1.0
+        upload = self._upload
+        if self.chunked or upload is None or self.preview is None:
+            return self._fraction
+        return min(upload.tell() / self.size, 1.0)
+
+    def _stage(self, stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings[stage] = time.perf_counter() - start
+        return result
+
+    def _run(self):
+        try:
+            with _upload_lock(self.digest):
+                if not self.chunked and self.store is not None:
+                    self.store.attach_base(self)
+                preview = self._stage('preview', preview_telemetry, self._upload, self.columns)
+                self.preview_stats = frame_stats(preview)
+                self.preview = preview
+                if self.chunked:
+                    self.status = "جاري قراءة الملف على دفعات..."
+                    self._result = self._stage(
+                        'parse', read_telemetry_chunked, self.digest, self.columns, self._upload, self
+                    )
+                    self.nbytes = _frame_bytes(self._result[0]) + _frame_bytes(self._result[2])
+                    self.nbytes += sum(_frame_bytes(level) for level in self._result[3].values())
+                    return
+                self._result = self._read_full() if self.base is None else self._extend(*self.base.result())
+        except Exception as e:
+            self._error = e
+        finally:
+            # the finished job stays cached; do not keep the upload's bytes alive with it
+            self._upload = None
+            self._done.set()
+
+    def _read_full(self):
+        self.status = "جاري قراءة الملف..."
+        data = self._stage('parse', read_telemetry, self.digest, self.columns, self._upload)
+        self.status = "جاري كشف الأحداث..."
+        events = self._stage('events', lambda: index_events(detect_events(data)))
+        self.status = "جاري بناء مستويات التجميع الزمني..."
+        rollups = self._stage('rollups', build_rollups, data)
+        self.nbytes = _frame_bytes(data) + _frame_bytes(events) + sum(_frame_bytes(level) for level in rollups.values())
+        return data, None, events, rollups
+
+    def _extend(self, base_data, _, base_events, base_rollups):
+        """The base's columns plus the missing ones; rows are in the same order, as both are sorted stably by Timestamp."""
+        shared = [col for col in base_data.columns if col in self.columns]
+        missing = set(self.columns) - set(base_data.columns)
+        extra = pd.DataFrame(index=base_data.index)
+        if missing:
+            self.status = "جاري قراءة الأعمدة الإضافية..."
+            extra = self._stage('parse', read_telemetry, self.digest, tuple(sorted(missing | {'Timestamp'})), self._upload)
+            extra = extra.drop(columns=[col for col in extra.columns if col not in missing])
+        data = pd.DataFrame({**{col: base_data[col] for col in shared}, **dict(extra.items())}, copy=False)
+        data.attrs.update(base_data.attrs)
+
+        events = base_events
+        if set(EVENT_SIGNALS) & set(data.columns) != set(EVENT_SIGNALS) & set(base_data.columns):
+            self.status = "جاري كشف الأحداث..."
+            events = self._stage('events', lambda: index_events(detect_events(data)))
+        parts = [(base_rollups, shared)]
+        if len(extra.columns) and 'Timestamp' in data.columns:
+            self.status = "جاري بناء مستويات التجميع الزمني..."
+            extra_rollups = self._stage('rollups', build_rollups, pd.concat([data[['Timestamp']], extra], axis=1))
+            parts.append((extra_rollups, list(extra.columns)))
+        rollups = combine_rollups(parts)
+
+        self.nbytes = _frame_bytes(extra) + (_frame_bytes(events) if events is not base_events else 0)
+        self.nbytes += sum(_frame_bytes(level, list(extra.columns)) for level in rollups.values())
+        return data, None, events, rollups
+
+    def result(self):
+        """(data, histograms, events, rollups), waiting for the worker if it is still running."""
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def _frame_bytes(frame, columns=None):
+    """Memory of a frame, or of the fields of the given columns (e.g. a rollup level's <column>_min...)."""
+    fields = [field for field in frame.columns if columns is None or field.rsplit('_', 1)[0] in columns]
+    return int(sum(frame[field].memory_usage(deep=True, index=False) for field in fields))
+
+
+class SessionRef:
+    """Token kept in a session's state; the dataset the session holds is released once the token is garbage collected."""
+
+
+class DatasetStore:
+    """IngestJobs keyed by (content hash, columns, mode), shared by every session of the process.
+
+    Each session holds the one dataset it is showing. Datasets no session
+    holds stay loaded for the next session that opens the same log, and are
+    evicted least recently used first once the finished datasets take more
+    than `memory_bytes`. A job that extends a base job keeps the base loaded
+    while it lives, since it shares the base's arrays.
+    """
+
+    def __init__(self, memory_bytes=DATASET_MEMORY_BYTES):
+        self.memory_bytes = memory_bytes
+        self.jobs = OrderedDict()  # least recently used first
+        self.holders = weakref.WeakKeyDictionary()  # SessionRef -> key of the held job
+        self.lock = threading.Lock()
+
+    def acquire(self, ref, digest, columns, chunked, uploaded_file):
+        """The job for (digest, columns, chunked), started if needed and held by `ref` instead of its previous one."""
+        key = (digest, columns, chunked)
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None or job.failed:
+                job = self.jobs[key] = IngestJob(digest, columns, chunked, uploaded_file, self)
+            self.jobs.move_to_end(key)
+            self.holders[ref] = key
+            self._evict()
+        return job
+
+    def attach_base(self, job):
+        """Set `job.base` to the loaded full-mode dataset of the same upload with the most of its columns besides Timestamp.
+
+        Called by the job's worker once it holds the upload's lock, so jobs that
+        were still parsing the upload when `job` was created have finished.
+        """
+        wanted = set(job.columns) - {'Timestamp'}
+        with self.lock:
+            overlap = {
+                other: len(wanted & set(other.result()[0].columns))
+                for (digest, _, chunked), other in self.jobs.items()
+                if digest == job.digest and not chunked and other.done and not other.failed
+            }
+            base = max(overlap, key=overlap.get, default=None)
+            if base is not None and overlap[base]:
+                job.base = base
+
+    def nbytes(self):
+        return sum(job.nbytes for job in self.jobs.values())
+
+    def _evict(self):
+        held = set(self.holders.values())
+        bases = {id(job.base) for job in self.jobs.values() if job.base is not None}
+        total = self.nbytes()
+        for key, job in list(self.jobs.items()):
+            if total <= self.memory_bytes:
+                break
+            if key in held or id(job) in bases or not job.done:
+                continue
+            del self.jobs[key]
+            total -= job.nbytes
+
+
+@st.cache_resource(show_spinner=False)
+def dataset_store():
+    """The process-wide DatasetStore."""
+    return DatasetStore()
+
+
+def ingest_job(digest, columns, chunked, uploaded_file):
+    """The IngestJob of an upload from the shared store, held by the current session until it asks for another."""
+    if 'dataset_ref' not in st.session_state:
+        st.session_state['dataset_ref'] = SessionRef()
+    return dataset_store().acquire(st.session_state['dataset_ref'], digest, columns, chunked, uploaded_file)
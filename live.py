@@ -0,0 +1,222 @@
+"""Live mode: follow a growing CSV file or a local UDP feed through a fixed-size ring buffer.
+
+Each poll reads only what arrived since the previous one and writes it into
+the ring buffer, overwriting the oldest rows, so memory stays at `capacity`
+rows however long the session runs.
+"""
+import csv
+import io
+import os
+import socket
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from telemetry import TELEMETRY_SCHEMA, apply_schema, csv_dtypes, parse_timestamps, schema_dtypes
+
+
+LIVE_CAPACITY = 50_000  # rows kept in the ring buffer
+LIVE_REFRESH_SECONDS = 1.0
+LIVE_BACKFILL_BYTES = 4 * 1024 ** 2  # history read from the end of an existing file when tailing starts
+LIVE_READ_BYTES = 16 * 1024 ** 2  # upper bound on what one poll reads, so a burst cannot stall a refresh
+# the only folder live CSV mode reads from; the path typed in the sidebar is taken relative to it
+LIVE_DIR = Path(os.environ.get('TELEMETRY_LIVE_DIR', 'live_logs'))
+LIVE_SOURCES = {'csv': 'ملف CSV يتم تحديثه', 'udp': 'منفذ UDP محلي'}
+LIVE_COLUMNS = ('Timestamp',) + tuple(TELEMETRY_SCHEMA)  # column order of UDP lines sent without a header
+
+
+def live_csv_path(name):
+    """Resolved path of a file under LIVE_DIR; raises ValueError for anything that resolves outside it."""
+    folder = LIVE_DIR.resolve()
+    path = (folder / name).resolve()
+    if path == folder or not path.is_relative_to(folder):
+        raise ValueError(f"live files must be inside {LIVE_DIR}")
+    return path
+
+
+def parse_header(line):
+    """Column names of a CSV header line (bytes), honouring quotes and a UTF-8 BOM."""
+    return [col.strip() for col in next(csv.reader([line.decode('utf-8-sig')]), [])]
+
+
+def parse_lines(lines, columns):
+    """Frame of complete CSV lines (bytes, no header) in the given column order, with the schema applied."""
+    if not lines.strip():
+        return pd.DataFrame(columns=list(columns))
+    known = set(columns)
+    try:
+        frame = apply_schema(pd.read_csv(io.BytesIO(lines), names=list(columns), header=None, dtype=csv_dtypes(known)))
+    except (ValueError, TypeError):
+        # a malformed line: read everything as text and blank the values that are not numbers
+        frame = pd.read_csv(io.BytesIO(lines), names=list(columns), header=None)
+        for col in schema_dtypes(known):
+            frame[col] = pd.to_numeric(frame[col], errors='coerce')
+        apply_schema(frame)
+    if 'Timestamp' in frame.columns:
+        parse_timestamps(frame)
+    return frame
+
+
+class CsvTail:
+    """New rows appended to a CSV file since the last read.
+
+    The header is read once; tailing starts LIVE_BACKFILL_BYTES before the end
+    of the file, and starts over if the file is truncated or replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = None
+        self.offset = 0
+        self.partial = b''
+        self.inode = None
+
+    def _start(self, f):
+        """Read the header and seek to where tailing starts; leaves `columns` unset until the header line is complete."""
+        self.columns = None
+        self.offset = 0
+        self.partial = b''
+        header = f.readline()
+        if not header.endswith(b'\n'):
+            return
+        self.columns = parse_header(header)
+        self.offset = max(f.tell(), os.fstat(f.fileno()).st_size - LIVE_BACKFILL_BYTES)
+        if self.offset > f.tell():
+            f.seek(self.offset - 1)
+            # resume at the next line start
+            if f.read(1) != b'\n':
+                f.readline()
+            self.offset = f.tell()
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if self.columns is None or stat.st_ino != self.inode or stat.st_size < self.offset:
+                self.inode = stat.st_ino
+                self._start(f)
+                if self.columns is None:
+                    return pd.DataFrame()
+            f.seek(self.offset)
+            chunk = f.read(LIVE_READ_BYTES)
+        self.offset += len(chunk)
+        data = self.partial + chunk
+        end = data.rfind(b'\n') + 1
+        self.partial = data[end:]
+        return parse_lines(data[:end], self.columns)
+
+
+class UdpSource:
+    """Rows sent as CSV lines in UDP datagrams to a local port.
+
+    Lines are in LIVE_COLUMNS order unless a header line (one with a
+    Timestamp column) has been received, which then sets the order.
+    """
+
+    def __init__(self, port, host='127.0.0.1'):
+        self.columns = list(LIVE_COLUMNS)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+    def read(self):
+        lines = []
+        received = 0
+        while received < LIVE_READ_BYTES:
+            try:
+                datagram = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            received += len(datagram)
+            for line in datagram.splitlines():
+                # only lines naming the column can be headers; parse just those
+                header = parse_header(line) if b'Timestamp' in line else ()
+                if 'Timestamp' in header:
+                    self.columns = header
+                    lines.clear()
+                elif line.strip():
+                    lines.append(line)
+        return parse_lines(b'\n'.join(lines), self.columns)
+
+    def close(self):
+        self.sock.close()
+
+
+class RingBuffer:
+    """The last `capacity` rows of a feed in preallocated arrays: datetime64 Timestamp and float32 signals."""
+
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.columns = [col for col in columns if col != 'Timestamp']
+        self.timestamps = np.full(capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.values = {col: np.full(capacity, np.nan, dtype=np.float32) for col in self.columns}
+        self.end = 0  # rows written since the start, the newest at (end - 1) % capacity
+
+    def __len__(self):
+        return min(self.end, self.capacity)
+
+    def append(self, frame):
+        frame = frame.iloc[-self.capacity:]
+        n = len(frame)
+        if n == 0:
+            return
+        positions = (self.end + np.arange(n)) % self.capacity
+        # columns the batch does not supply are blanked, not left holding the overwritten rows
+        if 'Timestamp' in frame.columns and pd.api.types.is_datetime64_any_dtype(frame['Timestamp']):
+            self.timestamps[positions] = frame['Timestamp'].to_numpy().astype('datetime64[ns]')
+        else:
+            self.timestamps[positions] = np.datetime64('NaT')
+        for col in self.columns:
+            if col in frame.columns and pd.api.types.is_numeric_dtype(frame[col]):
+                self.values[col][positions] = frame[col].to_numpy(dtype=np.float32, na_value=np.nan)
+            else:
+                self.values[col][positions] = np.nan
+        self.end += n
+
+    def frame(self):
+        """The buffered rows, oldest first."""
+        order = np.arange(self.end - len(self), self.end) % self.capacity
+        return pd.DataFrame({'Timestamp': self.timestamps[order], **{col: self.values[col][order] for col in self.columns}})
+
+
+class LiveFeed:
+    """A source polled into a ring buffer, created once per session and source."""
+
+    def __init__(self, source, capacity=LIVE_CAPACITY):
+        self.source = source
+        self.capacity = capacity
+        self.buffer = None
+        self.received = 0
+
+    def poll(self):
+        """Read what arrived since the last poll into the buffer; returns the number of new rows.
+
+        Rows without a valid Timestamp cannot be placed on the charts' time
+        axis and are dropped here, so the buffer holds no NaT.
+        """
+        rows = self.source.read()
+        if self.buffer is None and self.source.columns is not None:
+            self.buffer = RingBuffer(self.capacity, self.source.columns)
+        if 'Timestamp' in rows.columns and pd.api.types.is_datetime64_any_dtype(rows['Timestamp']):
+            rows = rows[rows['Timestamp'].notna()]
+        else:
+            rows = rows.iloc[:0]
+        if self.buffer is None or rows.empty:
+            return 0
+        self.buffer.append(rows)
+        self.received += len(rows)
+        return len(rows)
+
+    def frame(self):
+        """The buffered rows sorted by Timestamp, as the time helpers in telemetry expect."""
+        if self.buffer is None:
+            return pd.DataFrame(columns=['Timestamp'])
+        frame = self.buffer.frame()
+        if not frame['Timestamp'].is_monotonic_increasing:
+            # lines can arrive out of order, e.g. UDP datagrams
+            frame = frame.sort_values('Timestamp', kind='stable', ignore_index=True)
+        return frame
+
+    def close(self):
+        if hasattr(self.source, 'close'):
+            self.source.close()
@@ -0,0 +1,83 @@
+"""Optional per-run timings and payload sizes for the dashboard's hot path."""
+from contextlib import contextmanager
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+import plotly.io as pio
+
+
+# on by default when DASHBOARD_METRICS is set, e.g. DASHBOARD_METRICS=1 streamlit run app2.py
+METRICS_DEFAULT = os.environ.get('DASHBOARD_METRICS', '').lower() not in ('', '0', 'false', 'no')
+
+logger = logging.getLogger('dashboard.metrics')
+if not logger.handlers:
+    # one JSON object per line on stderr, independent of Streamlit's own log format
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RunMetrics:
+    """Stage timings and payload sizes collected during one script run.
+
+    Disabled instances record nothing, so the app can wrap its stages
+    unconditionally.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.time()
+        self.records = []
+
+    @contextmanager
+    def stage(self, stage, chart=None):
+        """Time the body of the with block as one record of the given stage."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, chart)
+
+    def record(self, stage, seconds, chart=None):
+        """Add a stage timed elsewhere, e.g. on the ingestion thread."""
+        if self.enabled:
+            self.records.append({'stage': stage, 'chart': chart, 'seconds': seconds})
+
+    def payload(self, chart, fig):
+        """Record the size of a figure as Streamlit serializes it for the browser."""
+        if self.enabled:
+            size = len(pio.to_json(fig, validate=False).encode('utf-8'))
+            self.records.append({'stage': 'payload', 'chart': chart, 'bytes': size})
+
+    def stages(self):
+        """Total seconds per stage, charts summed."""
+        timed = [r for r in self.records if 'seconds' in r]
+        if not timed:
+            return pd.DataFrame(columns=['seconds'])
+        return pd.DataFrame(timed).groupby('stage', sort=False)[['seconds']].sum()
+
+    def charts(self):
+        """One row per chart with its build and render seconds and payload bytes."""
+        per_chart = [r for r in self.records if r['chart'] is not None]
+        if not per_chart:
+            return pd.DataFrame()
+        frame = pd.DataFrame(per_chart)
+        frame['value'] = frame['seconds'].fillna(frame['bytes']) if 'bytes' in frame else frame['seconds']
+        table = frame.pivot_table(index='chart', columns='stage', values='value', aggfunc='sum', sort=False)
+        return table.rename(columns=lambda stage: 'bytes' if stage == 'payload' else f'{stage}_s')
+
+    def to_json(self):
+        return json.dumps({'started': self.started, 'records': self.records}, ensure_ascii=False)
+
+    def log(self):
+        """Write every record as a structured log line."""
+        for record in self.records:
+            logger.info(json.dumps({'run': self.started, **record}, ensure_ascii=False))
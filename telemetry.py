@@ -0,0 +1,1078 @@
+"""Telemetry ingestion, caching and reduction for the vehicle dashboard."""
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, replace
+from datetime import date
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.tseries.api import guess_datetime_format
+import streamlit as st
+
+
+def upload_digest(uploaded_file, metrics=None):
+    """Content hash of an upload, computed once per uploaded file and kept in the session.
+
+    The hashing itself is timed as the 'upload_hash' stage of `metrics`, so
+    reruns that reuse the kept hash record nothing.
+    """
+    key = f"upload_digest_{uploaded_file.file_id}"
+    if key not in st.session_state:
+        with metrics.stage('upload_hash') if metrics is not None else nullcontext():
+            st.session_state[key] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return st.session_state[key]
+
+
+# declared dtypes of the known telemetry columns
+TELEMETRY_SCHEMA = {
+    'Engine_RPM': 'float32',
+    'Engine_Load_Percent': 'float32',
+    'Coolant_Temp_C': 'float32',
+    'Oil_Temp_C': 'float32',
+    'Battery_Voltage_V': 'float32',
+    'MAP_kPa': 'float32',
+    'MAF_gps': 'float32',
+    'Ignition_Timing_Deg': 'float32',
+    'EGR_Status': 'Int8',
+    'Catalytic_Converter_Percent': 'float32',
+    'Brake_Status': 'Int8',
+    'Tire_Pressure_psi': 'float32',
+    'Ambient_Temp_C': 'float32',
+}
+TIMESTAMP_FORMAT = 'ISO8601'
+TIMESTAMP_SAMPLE_ROWS = 1000  # values looked at to detect how a Timestamp column is written
+TIMESTAMP_GUESS_VALUES = 20  # of those, values whose format is guessed
+# epoch numbers below each limit are in that unit: seconds up to the year 5138, then ms, us, ns
+EPOCH_UNITS = (('s', 1e11), ('ms', 1e14), ('us', 1e17), ('ns', np.inf))
+
+
+def schema_dtypes(columns):
+    """TELEMETRY_SCHEMA restricted to the given columns."""
+    return {col: dtype for col, dtype in TELEMETRY_SCHEMA.items() if col in columns}
+
+
+def csv_dtypes(columns):
+    """dtypes passed to read_csv: nullable ints are parsed as float32 (the C parser's fast path) and cast by apply_schema."""
+    return {col: 'float32' if dtype == 'Int8' else dtype for col, dtype in schema_dtypes(columns).items()}
+
+
+def apply_schema(data):
+    """Cast known columns that were read with another dtype to TELEMETRY_SCHEMA."""
+    for col, dtype in schema_dtypes(data.columns).items():
+        if data[col].dtype == dtype:
+            continue
+        try:
+            data[col] = data[col].astype(dtype)
+        except (ValueError, TypeError):
+            pass
+    return data
+
+
+def _epoch_unit(numbers):
+    magnitude = np.nanmedian(np.abs(numbers))
+    return next(unit for unit, limit in EPOCH_UNITS if magnitude < limit)
+
+
+def timestamp_parser(values):
+    """How a Timestamp column is written, from a sample spread over it.
+
+    {'unit': 's' | 'ms' | 'us' | 'ns'} for epoch numbers (numeric columns or
+    numeric strings), {'format': ...} for ISO 8601 or another format pandas
+    can infer, or None when most of the sample fits none of these.
+    """
+    sample = values.dropna()
+    sample = sample.iloc[::max(len(sample) // TIMESTAMP_SAMPLE_ROWS, 1)]
+    if sample.empty:
+        return None
+    if pd.api.types.is_numeric_dtype(sample):
+        return {'unit': _epoch_unit(sample.to_numpy(dtype=float))}
+    sample = sample.astype(str).str.strip()
+    numbers = pd.to_numeric(sample, errors='coerce')
+    if numbers.notna().mean() > 0.5:
+        return {'unit': _epoch_unit(numbers.to_numpy(dtype=float))}
+    # formats guessed from a few values, most common first, so one malformed value does not decide
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # day-first guesses warn about dayfirst=False
+        guesses = pd.Series([guess_datetime_format(value) for value in sample.iloc[::max(len(sample) // TIMESTAMP_GUESS_VALUES, 1)]])
+    for fmt in [TIMESTAMP_FORMAT, *guesses.value_counts().index]:
+        if pd.to_datetime(sample, format=fmt, errors='coerce', utc=True).notna().mean() > 0.5:
+            return {'format': fmt}
+    return None
+
+
+def to_timestamps(values, parser):
+    """datetime64 of a column in one vectorized call; values that do not fit the parser become NaT.
+
+    Times with UTC offsets are converted to UTC, so the result is always tz-naive.
+    """
+    if 'unit' in parser:
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors='coerce')
+        return pd.to_datetime(values, unit=parser['unit'], errors='coerce')
+    return pd.to_datetime(values, format=parser['format'], errors='coerce', utc=True).dt.tz_localize(None)
+
+
+def parse_timestamps(data):
+    """Convert Timestamp to datetime64 in place; returns False when it does not parse.
+
+    The format is detected once per column by timestamp_parser(). Values that
+    do not fit it are set to NaT instead of failing the whole column, and
+    are reported by prepare_timestamps().
+    """
+    if pd.api.types.is_datetime64_any_dtype(data['Timestamp']):
+        return True
+    parser = timestamp_parser(data['Timestamp'])
+    if parser is None:
+        return False
+    data['Timestamp'] = to_timestamps(data['Timestamp'], parser)
+    return True
+
+
+def prepare_timestamps(data):
+    """Parse Timestamp and sort by time.
+
+    Sorting once here lets time windows and days be sliced by binary search
+    instead of scanning the table; already sorted logs are not copied. Rows
+    that repeat the previous row's timestamp are kept, since a logger whose
+    clock is coarser than its sample rate writes several rows per tick and
+    binary search only needs the times to be non-decreasing. The number of
+    rows without a valid time and of rows with a repeated time are left in
+    data.attrs['missing_timestamps'] and data.attrs['duplicate_timestamps'].
+    The frame is returned unchanged when Timestamp is missing or does not parse.
+    """
+    # تحويل الوقت إلى تنسيق التاريخ
+    if 'Timestamp' not in data.columns or not parse_timestamps(data):
+        return data
+    if not data['Timestamp'].is_monotonic_increasing:
+        data = data.sort_values('Timestamp', kind='stable', ignore_index=True)
+    timestamps = data['Timestamp'].to_numpy()
+    data.attrs['missing_timestamps'] = int(np.count_nonzero(np.isnat(timestamps)))
+    data.attrs['duplicate_timestamps'] = int(np.count_nonzero(timestamps[1:] == timestamps[:-1]))  # NaT never compares equal
+    return data
+
+
+def has_timestamps(data):
+    return 'Timestamp' in data.columns and pd.api.types.is_datetime64_any_dtype(data['Timestamp'])
+
+
+CACHE_DIR = Path(os.environ.get('TELEMETRY_CACHE_DIR', '.telemetry_cache'))
+# disk used by the column store before the least recently used uploads are removed
+CACHE_MAX_BYTES = int(float(os.environ.get('TELEMETRY_CACHE_MAX_MB', 10240)) * 1024 ** 2)
+COLUMNAR_SUFFIXES = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+ARROW_TYPES = {pa.int8(): pd.Int8Dtype()}  # keep nullable status columns nullable on the way back
+
+
+class ColumnStore:
+    """On-disk cache of parsed upload columns, keyed by content hash.
+
+    Each column is an Arrow IPC file under CACHE_DIR/<digest>/, written in
+    chunk-sized record batches and read back memory-mapped, so a reload only
+    touches the columns a chart needs and never re-parses the CSV. Reading an
+    upload's folder marks it as used; once the store passes CACHE_MAX_BYTES,
+    the least recently used folders are removed after each write.
+    """
+
+    def __init__(self, digest):
+        self.folder = CACHE_DIR / digest
+
+    def columns(self):
+        if not self.folder.is_dir():
+            return set()
+        return {path.stem for path in self.folder.glob('*.arrow')}
+
+    def _readers(self, columns):
+        if columns:
+            os.utime(self.folder)
+        return {col: pa.ipc.open_file(pa.memory_map(str(self.folder / f'{col}.arrow'))) for col in columns}
+
+    def read(self, columns):
+        readers = self._readers(columns)
+        table = pa.table({col: reader.read_all().column(0) for col, reader in readers.items()})
+        return table.to_pandas(types_mapper=ARROW_TYPES.get)
+
+    def iter_chunks(self, columns):
+        """Yield (frame, fraction done) one record batch at a time."""
+        readers = self._readers(columns)
+        batches = min(reader.num_record_batches for reader in readers.values())
+        for i in range(batches):
+            table = pa.table({col: reader.get_batch(i).column(0) for col, reader in readers.items()})
+            yield table.to_pandas(types_mapper=ARROW_TYPES.get), (i + 1) / batches
+
+    @contextmanager
+    def writer(self):
+        """Append frames batch by batch; files only become visible if the whole write succeeds."""
+        writer = _ColumnStoreWriter(self.folder)
+        try:
+            yield writer
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+        prune_cache(keep=self.folder)
+
+
+def prune_cache(keep=None, max_bytes=None):
+    """Remove the least recently used upload folders of CACHE_DIR until it fits max_bytes (CACHE_MAX_BYTES)."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not CACHE_DIR.is_dir():
+        return
+    folders = []
+    for folder in CACHE_DIR.iterdir():
+        try:
+            size = sum(path.stat().st_size for path in folder.iterdir())
+            folders.append((folder.stat().st_mtime, size, folder))
+        except OSError:
+            continue  # removed by another writer meanwhile
+    total = sum(size for _, size, _ in folders)
+    for _, size, folder in sorted(folders):
+        if total <= max_bytes:
+            break
+        if folder == keep:
+            continue
+        # readers that still have a file memory-mapped keep it until they close it
+        shutil.rmtree(folder, ignore_errors=True)
+        total -= size
+
+
+class _ColumnStoreWriter:
+    def __init__(self, folder):
+        self.folder = folder
+        self.sinks = {}  # column -> (sink, temporary path)
+        self.dropped = set()
+
+    def write(self, frame):
+        for col in frame.columns:
+            if col in self.dropped:
+                continue
+            try:
+                array = pa.Array.from_pandas(frame[col])
+                if col not in self.sinks:
+                    self.folder.mkdir(parents=True, exist_ok=True)
+                    schema = pa.schema([(col, array.type)])
+                    # a name of its own, so concurrent writers of the same upload never share a file
+                    fd, path = tempfile.mkstemp(dir=self.folder, prefix=f'{col}.', suffix='.arrow.tmp')
+                    os.close(fd)
+                    self.sinks[col] = pa.ipc.new_file(path, schema), path
+                self.sinks[col][0].write_batch(pa.record_batch([array], names=[col]))
+            except (pa.ArrowException, ValueError, OSError):
+                self.drop(col)
+
+    def drop(self, col):
+        """Stop caching a column, e.g. when its type changes between chunks."""
+        self.dropped.add(col)
+        sink, path = self.sinks.pop(col, (None, None))
+        if sink is not None:
+            sink.close()
+            Path(path).unlink(missing_ok=True)
+
+    def commit(self):
+        for col, (sink, path) in self.sinks.items():
+            sink.close()
+            os.replace(path, self.folder / f'{col}.arrow')
+
+    def abort(self):
+        for col in list(self.sinks):
+            self.drop(col)
+
+
+def upload_format(uploaded_file):
+    """'csv', 'parquet' or 'feather', from the upload's file extension."""
+    return COLUMNAR_SUFFIXES.get(Path(uploaded_file.name).suffix.lower(), 'csv')
+
+
+def upload_columns(uploaded_file):
+    """Column names of an upload, read from the CSV header or the columnar schema."""
+    uploaded_file.seek(0)
+    kind = upload_format(uploaded_file)
+    if kind == 'parquet':
+        return pq.ParquetFile(uploaded_file).schema_arrow.names
+    if kind == 'feather':
+        return pa.ipc.open_file(uploaded_file).schema.names
+    return list(pd.read_csv(uploaded_file, nrows=0).columns)
+
+
+def columnar_chunks(uploaded_file, columns):
+    """Yield (frame, fraction done) from a Parquet/Feather upload one record batch at a time."""
+    uploaded_file.seek(0)
+    if upload_format(uploaded_file) == 'parquet':
+        source = pq.ParquetFile(uploaded_file)
+        total = max(source.metadata.num_rows, 1)
+        done = 0
+        for batch in source.iter_batches(batch_size=CHUNK_ROWS, columns=list(columns)):
+            done += batch.num_rows
+            yield apply_schema(batch.to_pandas(types_mapper=ARROW_TYPES.get)), done / total
+    else:
+        reader = pa.ipc.open_file(uploaded_file)
+        names = reader.schema.names
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i).select([names.index(col) for col in columns])
+            yield apply_schema(batch.to_pandas(types_mapper=ARROW_TYPES.get)), (i + 1) / reader.num_record_batches
+
+
+def csv_chunks(uploaded_file, columns, dtypes, store):
+    """Yield (frame, fraction done) from a CSV upload, writing each parsed chunk to the column store."""
+    uploaded_file.seek(0)
+    size = max(uploaded_file.size, 1)
+    reader = pd.read_csv(uploaded_file, usecols=lambda col: col in columns, dtype=dtypes, chunksize=CHUNK_ROWS)
+    with store.writer() as writer:
+        for chunk in reader:
+            if dtypes is not None:
+                apply_schema(chunk)
+            if 'Timestamp' in chunk.columns and not parse_timestamps(chunk):
+                writer.drop('Timestamp')
+            writer.write(chunk)
+            yield chunk, min(uploaded_file.tell() / size, 1.0)
+
+
+PREVIEW_ROWS = 10_000  # rows parsed ahead of the full read, for the early file info
+
+
+def preview_telemetry(uploaded_file, columns, rows=PREVIEW_ROWS):
+    """The first rows of the requested columns, read from the header and the first chunk only."""
+    available = set(columns) & set(upload_columns(uploaded_file))
+    uploaded_file.seek(0)
+    kind = upload_format(uploaded_file)
+    if kind != 'csv':
+        if kind == 'parquet':
+            batch = next(pq.ParquetFile(uploaded_file).iter_batches(batch_size=rows, columns=sorted(available)), None)
+        else:
+            reader = pa.ipc.open_file(uploaded_file)
+            names = reader.schema.names
+            batch = reader.get_batch(0).slice(0, rows) if reader.num_record_batches else None
+            batch = batch.select([names.index(col) for col in sorted(available)]) if batch is not None else None
+        data = apply_schema(batch.to_pandas(types_mapper=ARROW_TYPES.get)) if batch is not None else pd.DataFrame()
+        return prepare_timestamps(data)
+    usecols = lambda col: col in available
+    try:
+        data = apply_schema(pd.read_csv(uploaded_file, usecols=usecols, dtype=csv_dtypes(available), nrows=rows))
+    except (ValueError, TypeError):
+        uploaded_file.seek(0)
+        data = pd.read_csv(uploaded_file, usecols=usecols, nrows=rows)
+    return prepare_timestamps(data)
+
+
+def read_telemetry(digest, columns, uploaded_file):
+    """Read the requested columns of an upload.
+
+    CSV columns are parsed with the dtypes in TELEMETRY_SCHEMA (falling back to
+    pandas' defaults if the file does not fit) and persisted to the ColumnStore,
+    so later reads of the same content only read Arrow files. Parquet/Feather
+    uploads are read column by column directly. Uses no Streamlit elements,
+    so it can run on a worker thread.
+    """
+    available = set(columns) & set(upload_columns(uploaded_file))
+
+    uploaded_file.seek(0)
+    if upload_format(uploaded_file) == 'parquet':
+        return prepare_timestamps(apply_schema(pd.read_parquet(uploaded_file, columns=sorted(available))))
+    if upload_format(uploaded_file) == 'feather':
+        return prepare_timestamps(apply_schema(pd.read_feather(uploaded_file, columns=sorted(available))))
+
+    store = ColumnStore(digest)
+    missing = available - store.columns()
+    parsed = pd.DataFrame()
+    if missing:
+        usecols = lambda col: col in missing
+        try:
+            parsed = apply_schema(pd.read_csv(uploaded_file, usecols=usecols, dtype=csv_dtypes(missing)))
+        except (ValueError, TypeError):
+            uploaded_file.seek(0)
+            parsed = pd.read_csv(uploaded_file, usecols=usecols)
+        with store.writer() as writer:
+            if 'Timestamp' in parsed.columns and not parse_timestamps(parsed):
+                writer.drop('Timestamp')
+            writer.write(parsed)
+
+    data = store.read(available & store.columns())
+    for col in parsed.columns.difference(data.columns):
+        data[col] = parsed[col]
+    return prepare_timestamps(data)
+
+
+STREAMING_THRESHOLD_BYTES = 200 * 1024 ** 2  # uploads above this size are read in chunks by default
+CHUNK_ROWS = 250_000
+STREAMING_MAX_ROWS = 200_000  # upper bound on rows kept for the time-series charts in chunked mode
+
+
+STATS_QUANTILES = {'p5': 0.05, 'p25': 0.25, 'median': 0.5, 'p75': 0.75, 'p95': 0.95}
+UPPER_THRESHOLDS = {'Engine_RPM': (6000, 6500), 'Coolant_Temp_C': (105,)}  # limits used by the charts
+
+
+def column_stats(values, thresholds=()):
+    """count, min, max, mean, std, quantiles and exceedance counts of one column."""
+    v = np.asarray(values, dtype=float)
+    v = v[~np.isnan(v)]
+    if v.size == 0:
+        return {'count': 0}
+    quantiles = np.percentile(v, [100 * q for q in STATS_QUANTILES.values()])
+    return {
+        'count': v.size,
+        'min': float(v.min()),
+        'max': float(v.max()),
+        'mean': float(v.mean()),
+        'std': float(v.std(ddof=1)) if v.size > 1 else 0.0,
+        **{name: float(value) for name, value in zip(STATS_QUANTILES, quantiles)},
+        'above': {threshold: int(np.count_nonzero(v > threshold)) for threshold in thresholds},
+    }
+
+
+def frame_stats(data):
+    """column_stats() of every numeric column of a frame."""
+    numeric = [col for col in data.columns if pd.api.types.is_numeric_dtype(data[col])]
+    return {col: column_stats(data[col], UPPER_THRESHOLDS.get(col, ())) for col in numeric}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def telemetry_stats(digest, chunked, columns, _data, _histograms):
+    """Summary statistics of every numeric column, computed once per (upload, mode, columns)."""
+    if _histograms is not None:
+        return {col: histogram.stats() for col, histogram in _histograms.items()}
+    return frame_stats(_data)
+
+
+def stats_table(stats):
+    """Stats as a DataFrame with one row per column, exceedances flattened to '> limit' columns."""
+    rows = {}
+    for col, col_stats in stats.items():
+        row = {key: value for key, value in col_stats.items() if key != 'above'}
+        row.update({f'> {threshold:g}': count for threshold, count in col_stats.get('above', {}).items()})
+        rows[col] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+# (event, column, 'above' or 'below', limit): a signal past its limit for one or more consecutive rows
+EVENT_RULES = (
+    ('overrev', 'Engine_RPM', 'above', 6500),
+    ('overheat', 'Coolant_Temp_C', 'above', 105),
+    ('low_battery', 'Battery_Voltage_V', 'below', 11.8),
+    ('low_tire_pressure', 'Tire_Pressure_psi', 'below', 26),
+)
+EVENT_LABELS = {
+    'overrev': 'تجاوز دورات المحرك',
+    'overheat': 'ارتفاع حرارة سائل التبريد',
+    'low_battery': 'انخفاض جهد البطارية',
+    'low_tire_pressure': 'انخفاض ضغط الإطارات',
+}
+EVENT_SIGNALS = ('Timestamp',) + tuple(column for _, column, _, _ in EVENT_RULES)  # loaded with every chart selection
+EVENT_COLUMNS = ['event', 'column', 'start', 'end', 'duration', 'peak', 'rows', 'start_row', 'stop_row']
+
+
+def exceedance_runs(values, limit, above=True):
+    """(starts, stops) row positions of the runs of consecutive values past limit; NaN ends a run."""
+    y = np.asarray(values, dtype=float)
+    past = y > limit if above else y < limit
+    edges = np.diff(past.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_events(data, offset=0):
+    """Exceedance intervals of every EVENT_RULES signal present in data, as a frame of EVENT_COLUMNS.
+
+    Runs of past-limit rows are found with one diff per signal and their
+    peaks with one reduceat, so the cost is a few vector passes regardless of
+    the event count. start_row/stop_row are row positions, shifted by offset.
+    """
+    timestamps = data['Timestamp'].to_numpy() if has_timestamps(data) else None
+    frames = []
+    for event, column, direction, limit in EVENT_RULES:
+        if column not in data.columns:
+            continue
+        y = np.asarray(data[column], dtype=float)
+        starts, stops = exceedance_runs(y, limit, direction == 'above')
+        if starts.size == 0:
+            continue
+        if direction == 'above':
+            peaks = np.maximum.reduceat(np.where(y > limit, y, -np.inf), starts)
+        else:
+            peaks = np.minimum.reduceat(np.where(y < limit, y, np.inf), starts)
+        start = pd.Series(timestamps[starts]) if timestamps is not None else pd.Series(pd.NaT, index=range(starts.size))
+        end = pd.Series(timestamps[stops - 1]) if timestamps is not None else start
+        frames.append(pd.DataFrame({
+            'event': event,
+            'column': column,
+            'start': start,
+            'end': end,
+            'duration': end - start,
+            'peak': peaks.astype(data[column].dtype) if pd.api.types.is_float_dtype(data[column]) else peaks,
+            'rows': stops - starts,
+            'start_row': starts + offset,
+            'stop_row': stops + offset,
+        }))
+    if not frames:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def merge_events(frames):
+    """Concatenate per-chunk event tables, joining intervals that continue across a chunk boundary."""
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    events = pd.concat(frames, ignore_index=True).sort_values(['event', 'start_row'], ignore_index=True)
+    continues = (events['event'] == events['event'].shift()) & (events['start_row'] == events['stop_row'].shift())
+    if not continues.any():
+        return events
+    merged = events.groupby((~continues).cumsum(), sort=False).agg(
+        event=('event', 'first'),
+        column=('column', 'first'),
+        start=('start', 'first'),
+        end=('end', 'last'),
+        peak_max=('peak', 'max'),
+        peak_min=('peak', 'min'),
+        rows=('rows', 'sum'),
+        start_row=('start_row', 'first'),
+        stop_row=('stop_row', 'last'),
+    )
+    above = merged['event'].map({event: direction == 'above' for event, _, direction, _ in EVENT_RULES})
+    merged['peak'] = merged['peak_max'].where(above, merged['peak_min'])
+    merged['duration'] = merged['end'] - merged['start']
+    return merged[EVENT_COLUMNS].reset_index(drop=True)
+
+
+def index_events(events):
+    """Events sorted by start time, so time-window lookups can use binary search."""
+    return events.sort_values(['start', 'event'], kind='stable', ignore_index=True)
+
+
+def events_in_window(events, start, end):
+    """Events overlapping [start, end], from a table sorted by start."""
+    if events is None or events.empty or start is None:
+        return events
+    hi = events['start'].to_numpy().searchsorted(np.datetime64(pd.Timestamp(end)), side='right')
+    candidates = events.iloc[:hi]
+    return candidates[candidates['end'] >= pd.Timestamp(start)]
+
+# bucket widths of the rollup pyramid, finest first; each level is aggregated from the one before
+ROLLUP_LEVELS = {
+    '1s': pd.Timedelta(seconds=1),
+    '10s': pd.Timedelta(seconds=10),
+    '1min': pd.Timedelta(minutes=1),
+    '1h': pd.Timedelta(hours=1),
+}
+ROLLUP_MIN_REDUCTION = 4  # a level must have at most 1/4 as many buckets as there are rows to be kept
+ROLLUP_MAX_BUCKETS = 1_000_000  # finer levels are dropped during chunked ingestion once they pass this
+
+
+def _raw_aggregates(data):
+    """(ns, {column: (min, max, mean, count)}) of every valid-timestamp row, each row its own bucket."""
+    if not has_timestamps(data):
+        return np.array([], dtype=np.int64), {}
+    ns = data['Timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+    valid = data['Timestamp'].notna().to_numpy()
+    aggregates = {}
+    for col in data.columns:
+        if col == 'Timestamp' or not pd.api.types.is_numeric_dtype(data[col]):
+            continue
+        values = data[col].to_numpy(dtype=float, na_value=np.nan)[valid]
+        aggregates[col] = (values, values, values, (~np.isnan(values)).astype(np.int64))
+    return ns[valid], aggregates
+
+
+def _level_aggregates(level):
+    """(ns, aggregates) of a rollup level frame, the inverse of _rollup_frame."""
+    ns = level['Timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+    columns = [name[:-len('_count')] for name in level.columns if name.endswith('_count')]
+    return ns, {
+        col: tuple(level[f'{col}_{stat}'].to_numpy() for stat in ('min', 'max', 'mean', 'count'))
+        for col in columns
+    }
+
+
+def _rollup(ns, aggregates, width):
+    """Combine aggregates at sorted times ns into buckets of width (a Timedelta) starting on multiples of it."""
+    if ns.size == 0:
+        return ns, aggregates
+    ids = ns // width.value
+    starts = np.flatnonzero(np.diff(ids, prepend=ids[0] - 1))
+    if starts.size == ns.size:
+        # every row is already its own bucket (data sampled no faster than width)
+        return ids * width.value, aggregates
+    combined = {}
+    for col, (lows, highs, means, counts) in aggregates.items():
+        count = np.add.reduceat(counts, starts)
+        total = np.add.reduceat(np.where(counts > 0, means * counts, 0.0), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        combined[col] = (np.fmin.reduceat(lows, starts), np.fmax.reduceat(highs, starts), mean, count)
+    return ids[starts] * width.value, combined
+
+
+def _rollup_frame(ns, aggregates):
+    """Level frame: bucket start Timestamp and <column>_min/_max/_mean (float32) and _count (int64)."""
+    frame = {'Timestamp': ns.view('datetime64[ns]')}
+    for col, (lows, highs, means, counts) in aggregates.items():
+        frame[f'{col}_min'] = lows.astype(np.float32)
+        frame[f'{col}_max'] = highs.astype(np.float32)
+        frame[f'{col}_mean'] = means.astype(np.float32)
+        frame[f'{col}_count'] = counts
+    return pd.DataFrame(frame)
+
+
+class RollupBuilder:
+    """Builds the rollup pyramid chunk by chunk.
+
+    Every chunk is rolled up through all levels; buckets split across chunk
+    boundaries are merged in finish(). A level whose buckets pass
+    ROLLUP_MAX_BUCKETS is dropped on the way, so memory stays bounded.
+    """
+
+    def __init__(self):
+        self.parts = {name: [] for name in ROLLUP_LEVELS}
+        self.buckets = dict.fromkeys(ROLLUP_LEVELS, 0)
+        self.rows = 0
+
+    def update(self, chunk):
+        ns, aggregates = _raw_aggregates(chunk)
+        self.rows += ns.size
+        for name, width in ROLLUP_LEVELS.items():
+            ns, aggregates = _rollup(ns, aggregates, width)
+            if name not in self.parts:
+                continue
+            self.parts[name].append(_rollup_frame(ns, aggregates))
+            self.buckets[name] += ns.size
+            if self.buckets[name] > ROLLUP_MAX_BUCKETS:
+                del self.parts[name]
+
+    def finish(self):
+        """{level name: level frame} of the levels that reduce the rows at least ROLLUP_MIN_REDUCTION times."""
+        levels = {}
+        for name, parts in self.parts.items():
+            parts = [part for part in parts if len(part)]
+            if not parts:
+                continue
+            ns, aggregates = _level_aggregates(pd.concat(parts, ignore_index=True))
+            # chunks of an unsorted file give out-of-order buckets; sort so equal buckets are adjacent
+            order = np.argsort(ns, kind='stable')
+            ns = ns[order]
+            aggregates = {col: tuple(values[order] for values in stats) for col, stats in aggregates.items()}
+            ns, aggregates = _rollup(ns, aggregates, ROLLUP_LEVELS[name])
+            if ns.size * ROLLUP_MIN_REDUCTION <= self.rows:
+                levels[name] = _rollup_frame(ns, aggregates)
+        return levels
+
+
+def build_rollups(data):
+    """Rollup pyramid of a frame sorted by Timestamp: {level name: level frame}, finest first."""
+    ns, aggregates = _raw_aggregates(data)
+    rows = ns.size
+    if rows == 0:
+        return {}
+    levels = {}
+    for name, width in ROLLUP_LEVELS.items():
+        ns, aggregates = _rollup(ns, aggregates, width)
+        if ns.size * ROLLUP_MIN_REDUCTION <= rows:
+            levels[name] = _rollup_frame(ns, aggregates)
+    return levels
+
+
+def combine_rollups(parts):
+    """One pyramid from (pyramid, columns) parts built over different columns of the same rows.
+
+    The levels' arrays are shared with the parts, not copied.
+    """
+    combined = {}
+    for name in ROLLUP_LEVELS:
+        if not all(name in pyramid for pyramid, _ in parts):
+            continue
+        level = {'Timestamp': parts[0][0][name]['Timestamp']}
+        for pyramid, columns in parts:
+            level.update({
+                field: values for field, values in pyramid[name].items()
+                if field.rsplit('_', 1)[0] in columns
+            })
+        combined[name] = pd.DataFrame(level, copy=False)
+    return combined
+
+
+def rollup_rows(rollups, columns, start, end, max_points):
+    """Rows for a line chart from the coarsest rollup level that still fills max_points.
+
+    Picks the coarsest level with at least max_points // 2 buckets in
+    [start, end], merges its buckets down to exactly that many, and returns
+    two rows per bucket, its min then its max, under the bucket's start time.
+    Returns None when no level is fine enough (or one of the columns has no
+    rollup), leaving the window to the raw rows.
+    """
+    target = max(max_points // 2, 1)
+    for name in reversed(list(ROLLUP_LEVELS)):
+        level = rollups.get(name)
+        if level is None:
+            continue
+        if any(f'{col}_min' not in level.columns for col in columns):
+            return None
+        timestamps = level['Timestamp'].to_numpy()
+        lo = timestamps.searchsorted(np.datetime64(pd.Timestamp(start).floor(ROLLUP_LEVELS[name])), side='left')
+        hi = timestamps.searchsorted(np.datetime64(pd.Timestamp(end)), side='right')
+        if hi - lo < target:
+            continue
+        groups = np.unique(np.linspace(lo, hi, target + 1).astype(np.int64)[:-1])
+        rows = {'Timestamp': np.repeat(timestamps[groups], 2)}
+        for col in columns:
+            lows = np.fmin.reduceat(level[f'{col}_min'].to_numpy()[:hi], groups)
+            highs = np.fmax.reduceat(level[f'{col}_max'].to_numpy()[:hi], groups)
+            rows[col] = np.column_stack([lows, highs]).ravel()
+        return pd.DataFrame(rows)
+    return None
+
+class StreamingHistogram:
+    """Fixed-size histogram that is filled chunk by chunk.
+
+    The bin range starts at the first chunk's min/max and doubles (merging
+    neighbouring bins) whenever a later chunk falls outside it, so memory stays
+    at `bins` counters no matter how many rows are added.
+    """
+
+    def __init__(self, bins=1024, thresholds=()):
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.start = None
+        self.width = None
+        self.total = 0
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.exceedances = dict.fromkeys(thresholds, 0)
+
+    def update(self, values):
+        v = np.asarray(values, dtype=float)
+        v = v[np.isfinite(v)]  # an infinite value would double the range forever
+        if v.size == 0:
+            return
+        lo, hi = v.min(), v.max()
+        bins = len(self.counts)
+        if self.start is None:
+            self.start = lo
+            self.width = (hi - lo) / bins if hi > lo else max(abs(lo), 1.0) / bins
+        while lo < self.start or hi >= self.start + self.width * bins:
+            merged = self.counts.reshape(-1, 2).sum(axis=1)
+            if lo < self.start:
+                self.counts = np.concatenate([np.zeros_like(merged), merged])
+                self.start -= self.width * bins
+            else:
+                self.counts = np.concatenate([merged, np.zeros_like(merged)])
+            self.width *= 2
+
+        idx = np.clip(((v - self.start) / self.width).astype(np.int64), 0, bins - 1)
+        self.counts += np.bincount(idx, minlength=bins)
+        self.total += v.size
+        self.sum += v.sum()
+        self.sum_squares += np.square(v).sum()
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+        for threshold in self.exceedances:
+            self.exceedances[threshold] += int(np.count_nonzero(v > threshold))
+
+    def binned(self, nbins):
+        """(edges, counts) regrouped into at most nbins bins over the occupied range."""
+        nonzero = np.flatnonzero(self.counts)
+        if nonzero.size == 0:
+            return np.array([0.0, 1.0]), np.array([0])
+        first, last = nonzero[0], nonzero[-1] + 1
+        group = -(-(last - first) // nbins)
+        counts = self.counts[first:last]
+        counts = np.pad(counts, (0, -len(counts) % group)).reshape(-1, group).sum(axis=1)
+        edges = self.start + self.width * (first + group * np.arange(len(counts) + 1))
+        return edges, counts
+
+    def mean(self):
+        return self.sum / self.total if self.total else np.nan
+
+    def stats(self):
+        """Same layout as column_stats(); quantiles are interpolated from the bins."""
+        if not self.total:
+            return {'count': 0}
+        mean = self.mean()
+        variance = (self.sum_squares - self.total * mean ** 2) / max(self.total - 1, 1)
+        return {
+            'count': self.total,
+            'min': float(self.min),
+            'max': float(self.max),
+            'mean': float(mean),
+            'std': float(np.sqrt(max(variance, 0.0))),
+            **{name: float(self.quantile(q)) for name, q in STATS_QUANTILES.items()},
+            'above': dict(self.exceedances),
+        }
+
+    def quantile(self, q):
+        """Quantile interpolated linearly inside the bin that contains it."""
+        if not self.total:
+            return np.nan
+        cumulative = np.cumsum(self.counts)
+        target = q * self.total
+        i = int(np.searchsorted(cumulative, target))
+        before = cumulative[i - 1] if i > 0 else 0
+        fraction = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        return min(max(self.start + self.width * (i + fraction), self.min), self.max)
+
+
+def _reduce_chunks(chunks, progress):
+    """Consume (frame, fraction done) chunks into running histograms, the event table, the rollup pyramid and a min/max-preserving subset of rows."""
+    histograms = {}
+    kept, kept_rows = [], 0
+    events, offset = [], 0
+    rollups = RollupBuilder()
+    missing_timestamps = 0
+
+    for chunk, done in chunks:
+        if 'Timestamp' in chunk.columns and parse_timestamps(chunk):
+            missing_timestamps += int(chunk['Timestamp'].isna().sum())
+        events.append(detect_events(chunk, offset))
+        rollups.update(chunk)
+        offset += len(chunk)
+        numeric = [col for col in chunk.columns if pd.api.types.is_numeric_dtype(chunk[col])]
+        for col in numeric:
+            if col not in histograms:
+                histograms[col] = StreamingHistogram(thresholds=UPPER_THRESHOLDS.get(col, ()))
+            histograms[col].update(chunk[col])
+
+        budget = max(STREAMING_MAX_ROWS // (4 * max(len(numeric), 1)), 2)
+        kept.append(downsample_rows(chunk, numeric, budget))
+        kept_rows += len(kept[-1])
+        if kept_rows > STREAMING_MAX_ROWS:
+            kept = [downsample_rows(pd.concat(kept, ignore_index=True), numeric, 2 * budget)]
+            kept_rows = len(kept[0])
+
+        progress.progress(done, text="جاري قراءة الملف على دفعات...")
+
+    data = prepare_timestamps(pd.concat(kept, ignore_index=True) if kept else pd.DataFrame())
+    if has_timestamps(data):
+        # counted over every chunk, not only the rows kept
+        data.attrs['missing_timestamps'] = missing_timestamps
+    return data, histograms, index_events(merge_events(events)), rollups.finish()
+
+
+def reduce_upload_chunks(digest, columns, uploaded_file, reduce):
+    """reduce((frame, fraction done) chunks) over the requested columns of an upload.
+
+    Chunks come from the ColumnStore when every column is already cached;
+    a CSV that does not fit the schema dtypes is re-read with pandas' defaults.
+    """
+    available = set(columns) & set(upload_columns(uploaded_file))
+    if upload_format(uploaded_file) != 'csv':
+        return reduce(columnar_chunks(uploaded_file, available))
+    store = ColumnStore(digest)
+    if available and available <= store.columns():
+        return reduce(store.iter_chunks(available))
+    try:
+        return reduce(csv_chunks(uploaded_file, available, csv_dtypes(available), store))
+    except (ValueError, TypeError):
+        return reduce(csv_chunks(uploaded_file, available, None, store))
+
+
+def read_telemetry_chunked(digest, columns, uploaded_file, progress):
+    """Chunked variant of read_telemetry for uploads too large to parse in one go.
+
+    Returns a bounded, peak-preserving subset of rows for the time-series charts,
+    a StreamingHistogram per numeric column for the histogram charts, the
+    event table and the rollup pyramid, both built from every row as the
+    chunks go by. Peak memory is set by CHUNK_ROWS and STREAMING_MAX_ROWS, not
+    by the file size. `progress` is anything with st.progress()'s
+    .progress(fraction, text=...) method.
+    """
+    return reduce_upload_chunks(digest, columns, uploaded_file, lambda chunks: _reduce_chunks(chunks, progress))
+
+
+def value_histogram(values, nbins):
+    """(edges, counts) of np.histogram over the finite values."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return np.array([0.0, 1.0]), np.array([0])
+    counts, edges = np.histogram(values, bins=nbins)
+    return edges, counts
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def exact_histogram(digest, column, nbins, _values):
+    """value_histogram() of a fully loaded column, cached per (upload, column, bins)."""
+    return value_histogram(_values, nbins)
+
+
+def column_histogram(digest, data, histograms, column, nbins):
+    """(edges, counts) of a column, binned on the server.
+
+    Uses the running StreamingHistogram in chunked mode and an exact
+    np.histogram otherwise, cached when the data is an upload (digest is not
+    None), so the browser only receives nbins bars.
+    """
+    if histograms is not None:
+        return histograms[column].binned(nbins)
+    if digest is None:
+        return value_histogram(data[column], nbins)
+    return exact_histogram(digest, column, nbins, data[column])
+
+
+DEFAULT_MAX_POINTS = 2000  # points per series sent to the browser, roughly the chart width in pixels x2
+
+
+def minmax_indices(values, max_points):
+    """Row positions that keep the min and max of each bucket (M4-style downsampling).
+
+    The series is cut into max_points // 2 equal buckets and the extreme points
+    of every bucket are kept, together with the first and last row, so spikes
+    survive the reduction.
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+
+    buckets = max(max_points // 2, 1)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    idx = np.concatenate(([0, n - 1], lows, highs))
+    return np.unique(idx[idx < n])
+
+
+def downsample_rows(data, columns, max_points):
+    """Rows of data that preserve the peaks of every given column; all rows when max_points is None."""
+    if max_points is None or len(data) <= max_points:
+        return data
+    idx = np.unique(np.concatenate([minmax_indices(data[col], max_points) for col in columns]))
+    return data.iloc[idx]
+
+
+def select_rows(data, columns, max_points=None, reduce='minmax'):
+    """The projection, reduction and row take one chart needs from a (time-windowed) frame.
+
+    Row positions are picked from the requested columns only, by minmax_indices
+    or by a uniform sample (reduce='sample', fixed seed so reruns draw the same
+    points), and only those rows of Timestamp and the requested columns are
+    gathered; the other loaded columns are never copied.
+    """
+    projection = [col for col in dict.fromkeys(('Timestamp', *columns)) if col in data.columns]
+    positions = [data.columns.get_loc(col) for col in projection]
+    n = len(data)
+    if max_points is None or n <= max_points:
+        return data.iloc[:, positions]
+    if reduce == 'sample':
+        idx = np.sort(np.random.default_rng(0).choice(n, size=max_points, replace=False))
+    else:
+        idx = np.unique(np.concatenate([minmax_indices(data[col], max_points) for col in columns]))
+    return data.iloc[idx, positions]
+
+
+def timestamp_bounds(data):
+    """First and last valid Timestamp of a frame sorted by Timestamp, or None."""
+    if not has_timestamps(data):
+        return None
+    valid = data['Timestamp'].count()
+    if valid == 0:
+        return None
+    return data['Timestamp'].iloc[0], data['Timestamp'].iloc[valid - 1]
+
+
+def time_window(data, start, end):
+    """Rows with start <= Timestamp <= end, sliced by binary search on the sorted Timestamp column."""
+    timestamps = data['Timestamp'].to_numpy()
+    lo = timestamps.searchsorted(np.datetime64(pd.Timestamp(start)), side='left')
+    hi = timestamps.searchsorted(np.datetime64(pd.Timestamp(end)), side='right')
+    return data.iloc[lo:hi]
+
+
+def day_slices(data):
+    """{date: (start, stop)} row slice of every calendar day in a frame sorted by Timestamp.
+
+    Built with one binary search per day, so picking a day afterwards is a
+    plain positional slice.
+    """
+    bounds = timestamp_bounds(data)
+    if bounds is None:
+        return {}
+    midnights = pd.date_range(bounds[0].normalize(), bounds[1].normalize() + pd.Timedelta(days=1), freq='D')
+    edges = data['Timestamp'].to_numpy().searchsorted(midnights.to_numpy())
+    return {
+        day.date(): (int(start), int(stop))
+        for day, start, stop in zip(midnights[:-1], edges[:-1], edges[1:])
+        if stop > start
+    }
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def day_index(digest, chunked, columns, _data):
+    """day_slices() of a loaded upload, cached per (upload, mode, columns)."""
+    return day_slices(_data)
+
+
+@dataclass(frozen=True, eq=False)
+class TelemetryQuery:
+    """The one place chart data is selected from, for a loaded upload and the current selection.
+
+    Holds the frame sorted by Timestamp, what ingestion built beside it
+    (running histograms, rollup pyramid) and the time window and day picked
+    in the app. Charts ask it for a projection of the window or day reduced
+    to a point budget, a sample, or a histogram, and it answers each from
+    the cheapest source: a rollup level or a binary-search slice for time
+    ranges, the running histograms or a cached np.histogram for
+    distributions.
+    """
+    data: pd.DataFrame
+    digest: str = None  # None for frames that are not an upload, e.g. the live ring buffer
+    chunked: bool = False
+    histograms: dict = None
+    rollups: dict = None
+    window: tuple = None  # (start, end); None selects every row
+    day: date = None  # one of the days()
+
+    @property
+    def columns(self):
+        return self.data.columns
+
+    def bounds(self):
+        return timestamp_bounds(self.data)
+
+    def days(self):
+        if self.digest is None:
+            return day_slices(self.data)
+        return day_index(self.digest, self.chunked, tuple(self.data.columns), self.data)
+
+    def select(self, window=None, day=None):
+        """The same data with another time window and day."""
+        return replace(self, window=window, day=day)
+
+    def rows(self, day=False):
+        """All columns of the rows in the time window, or of the selected day within it."""
+        rows = self.data
+        if day:
+            if self.day is None:
+                return rows.iloc[0:0]
+            rows = rows.iloc[slice(*self.days()[self.day])]
+        return time_window(rows, *self.window) if self.window is not None else rows
+
+    def series(self, columns, max_points, day=False):
+        """Timestamp and columns of rows(day), at most about max_points rows.
+
+        When the rows outnumber max_points they come from the coarsest rollup
+        level that still fills the chart, so long windows touch thousands of
+        pre-aggregated buckets instead of every row; short windows, or data
+        without a pyramid, are min/max downsampled.
+        """
+        rows = self.rows(day)
+        if self.rollups and max_points is not None and len(rows) > max_points:
+            bounds = timestamp_bounds(rows)
+            if bounds is not None:
+                view = rollup_rows(self.rollups, columns, *bounds, max_points)
+                if view is not None:
+                    return view
+        return select_rows(rows, columns, max_points)
+
+    def sample(self, columns, max_points):
+        """A seeded uniform sample of max_points rows of the columns, over all rows."""
+        return select_rows(self.data, columns, max_points, reduce='sample')
+
+    def histogram(self, column, nbins):
+        """(edges, counts) of a column over all rows; see column_histogram()."""
+        return column_histogram(self.digest, self.data, self.histograms, column, nbins)
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the dashboard's modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import telemetry
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """A private, empty column store for every test."""
+    folder = tmp_path / 'telemetry_cache'
+    monkeypatch.setattr(telemetry, 'CACHE_DIR', folder)
+    return folder
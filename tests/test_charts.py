@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import pytest
+
+import charts
+from charts import CHARTS, build_figure, chart_figure, chart_figures, threshold_line_traces
+from telemetry import TelemetryQuery, frame_stats
+
+
+def points(trace):
+    y = np.asarray(trace.y, dtype=float)
+    return list(np.asarray(trace.x)[~np.isnan(y)]), list(y[~np.isnan(y)])
+
+
+def test_threshold_line_traces_splits_hot_and_cool_runs():
+    x = np.arange(7)
+    y = [0, 10, 0, 0, 0, 10, 0]
+    cool, hot = threshold_line_traces(x, y, threshold=5)
+    assert cool.line.color == 'seagreen' and hot.line.color == 'orangered'
+    assert points(cool) == ([2, 3, 4], [0, 0, 0])
+    assert points(hot) == ([0, 1, 2, 4, 5, 6], [0, 10, 0, 0, 10, 0])
+    # one NaN gap between the two hot runs, so they are not joined
+    assert int(np.isnan(np.asarray(hot.y, dtype=float)).sum()) == 1
+
+
+def test_threshold_line_traces_single_colour():
+    traces = threshold_line_traces(np.arange(4), [1, 2, 3, 4], threshold=5, trace_type=go.Scattergl)
+    assert len(traces) == 1 and isinstance(traces[0], go.Scattergl)
+    assert points(traces[0]) == ([0, 1, 2, 3], [1, 2, 3, 4])
+    assert len(threshold_line_traces([0], [9], threshold=5)) == 1
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Names of the charts built, with the figure builder replaced by a stub."""
+    built = []
+
+    def build_figure(chart_name, inputs):
+        built.append(chart_name)
+        return f"figure {len(built)}"
+
+    monkeypatch.setattr(charts, 'build_figure', build_figure)
+    charts._figure_slot.clear()
+    yield built
+    charts._figure_slot.clear()
+
+
+SERIES_CHART = next(name for name, spec in CHARTS.items() if 'max_points' in spec.params)
+
+
+def chart_inputs(data=None, digest='log', **settings):
+    if data is None:
+        data = pd.DataFrame(columns=['Timestamp', 'Engine_RPM'])
+    inputs = {'query': TelemetryQuery(data, digest)}
+    inputs.update({name: None for name in CHARTS[SERIES_CHART].params}, max_points=2000)
+    inputs.update(settings)
+    return inputs
+
+
+def test_chart_figure_reuses_figures_with_the_same_key(builds):
+    first = chart_figure(SERIES_CHART, chart_inputs())
+    assert chart_figure(SERIES_CHART, chart_inputs()) is first
+    chart_figure(SERIES_CHART, chart_inputs(max_points=500))
+    chart_figure(SERIES_CHART, chart_inputs(digest='other'))
+    chart_figure(SERIES_CHART, chart_inputs(data=pd.DataFrame(columns=['Timestamp'])))
+    assert len(builds) == 4
+    # settings the chart does not depend on are not part of its key
+    chart_figure(SERIES_CHART, chart_inputs(stats={'unused': 1}))
+    assert len(builds) == 4
+
+
+def test_chart_figure_does_not_cache_figures_without_a_point_limit(builds):
+    chart_figure(SERIES_CHART, chart_inputs(max_points=None))
+    chart_figure(SERIES_CHART, chart_inputs(max_points=None))
+    assert len(builds) == 2
+
+
+def test_oil_histogram_without_values_is_an_error_message():
+    data = pd.DataFrame({'Oil_Temp_C': np.full(10, np.nan, dtype='float32')})
+    inputs = {'query': TelemetryQuery(data, 'oil'), 'stats': frame_stats(data)}
+    assert isinstance(build_figure("4. Histogram of Oil Temperature", inputs), str)
+    data['Oil_Temp_C'] = np.float32(90)
+    inputs.update(query=TelemetryQuery(data, 'oil 90'), stats=frame_stats(data))
+    assert isinstance(build_figure("4. Histogram of Oil Temperature", inputs), go.Figure)
+
+
+def test_chart_figures_built_on_worker_processes():
+    data = pd.DataFrame({
+        'Timestamp': pd.date_range('2024-01-01', periods=5000, freq='s'),
+        'Engine_RPM': np.random.default_rng(0).normal(4000, 1000, 5000).astype('float32'),
+    })
+    inputs = chart_inputs(data, events=None, stats=frame_stats(data), render_backend='auto', webgl_threshold=100_000)
+    names = ["1. Histogram of Engine RPM", SERIES_CHART, "4. Histogram of Oil Temperature"]
+    expected = [charts._interactive_figure(name, inputs) for name in names]
+    charts._figure_slot.clear()
+    figures = chart_figures(names, inputs, workers=2)
+    assert figures[2] == expected[2]  # the error message for the missing column
+    for fig, built in zip(figures[:2], expected[:2]):
+        assert isinstance(fig, go.Figure)
+        assert json.loads(pio.to_json(fig)) == json.loads(pio.to_json(built))
+    # a rerun takes every figure from the cache
+    assert all(again is fig for again, fig in zip(chart_figures(names, inputs, workers=2), figures))
+    charts._figure_slot.clear()
@@ -0,0 +1,53 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from fleet import fleet_summaries, fleet_table
+
+
+class Upload(io.BytesIO):
+    """Bytes with the attributes of a Streamlit UploadedFile, which is a BytesIO too."""
+
+    def __init__(self, name, content):
+        super().__init__(content)
+        self.name = name
+        self.file_id = f'{name}-{len(content)}'
+        self.size = len(content)
+
+
+def vehicle_log(rpm, battery):
+    frame = pd.DataFrame({
+        'Timestamp': pd.date_range('2024-01-01', periods=len(rpm), freq='s').strftime('%Y-%m-%d %H:%M:%S'),
+        'Engine_RPM': rpm,
+        'Battery_Voltage_V': battery,
+    })
+    return frame.to_csv(index=False).encode()
+
+
+def test_fleet_summaries_and_table():
+    rpm = np.r_[np.full(50, 3000.0), np.full(20, 7000.0), np.full(30, 3000.0)]
+    uploads = [
+        Upload('truck.csv', vehicle_log(rpm, np.full(100, 12.5))),
+        Upload('van.csv', vehicle_log(np.full(3600, 2000.0), np.r_[np.full(3590, 12.5), np.full(10, 11.0)])),
+        Upload('truck.csv', vehicle_log(rpm[:60], np.full(60, 12.5))),
+    ]
+    summaries = fleet_summaries(uploads)
+    assert list(summaries) == ['truck', 'van', 'truck (2)']
+    table = fleet_table(summaries)
+    assert table.loc['truck', 'rows'] == 100 and table.loc['van', 'rows'] == 3600
+    assert table.loc['van', 'hours'] == (3599 / 3600)
+    assert table.loc['truck', 'Engine_RPM mean'] == rpm.mean()
+    assert table.loc['truck', 'Engine_RPM max'] == 7000
+    assert table.loc['van', 'Battery_Voltage_V min'] == 11.0
+    assert np.isnan(table.loc['van', 'Coolant_Temp_C max'])
+    assert table.loc['truck'].iloc[-4:].tolist() == [1, 0, 0, 0]
+    assert table.loc['van'].iloc[-4:].tolist() == [0, 0, 1, 0]
+    assert table.loc['truck (2)'].iloc[-4:].tolist() == [1, 0, 0, 0]
+
+
+def test_fleet_summaries_skip_infinite_values():
+    rpm = np.r_[np.full(10, 3000.0), np.inf, -np.inf]
+    summaries = fleet_summaries([Upload('truck.csv', vehicle_log(rpm, np.full(12, 12.5)))])
+    table = fleet_table(summaries)
+    assert table.loc['truck', 'rows'] == 12 and table.loc['truck', 'Engine_RPM max'] == 3000
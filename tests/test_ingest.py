@@ -0,0 +1,81 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from ingest import DatasetStore, SessionRef
+from telemetry import EVENT_SIGNALS, build_rollups, detect_events, index_events, read_telemetry
+
+
+class Upload(io.BytesIO):
+    """A file's bytes with the attributes of a Streamlit UploadedFile, which is a BytesIO too."""
+
+    def __init__(self, path):
+        super().__init__(path.read_bytes())
+        self.name = str(path)
+        self.file_id = self.name
+        self.size = len(self.getvalue())
+
+
+def write_log(path, rows=5000):
+    rng = np.random.default_rng(2)
+    times = pd.date_range('2024-01-01', periods=rows, freq='500ms').floor('s')  # two rows per second
+    frame = pd.DataFrame({
+        'Timestamp': times.strftime('%Y-%m-%d %H:%M:%S'),
+        'Engine_RPM': rng.normal(5000, 1000, rows).round(1),
+        'Coolant_Temp_C': rng.normal(100, 5, rows).round(1),
+        'Battery_Voltage_V': rng.normal(12.4, 0.4, rows).round(2),
+        'Tire_Pressure_psi': rng.normal(30, 3, rows).round(1),
+        'Oil_Temp_C': rng.normal(95, 6, rows).round(1),
+        'MAF_gps': rng.normal(20, 5, rows).round(1),
+    })
+    frame = pd.concat([frame.iloc[2000:2500], frame.drop(frame.index[2000:2500])])  # out of order
+    frame.to_csv(path, index=False)
+    return Upload(path)
+
+
+def sorted_columns(frame):
+    return frame[sorted(frame.columns)]
+
+
+def test_extended_job_equals_fresh_read(tmp_path):
+    upload = write_log(tmp_path / 'log.csv')
+    store, ref = DatasetStore(), SessionRef()
+    base_columns = tuple(sorted(EVENT_SIGNALS))
+    columns = tuple(sorted(set(EVENT_SIGNALS) | {'Oil_Temp_C', 'MAF_gps'}))
+
+    base = store.acquire(ref, 'log', base_columns, False, upload)
+    base.result()
+    job = store.acquire(ref, 'log', columns, False, upload)
+    data, _, events, rollups = job.result()
+    assert job.base is base
+    assert np.shares_memory(data['Engine_RPM'].to_numpy(), base.result()[0]['Engine_RPM'].to_numpy())
+
+    fresh = read_telemetry('fresh', columns, upload)
+    pd.testing.assert_frame_equal(sorted_columns(data), sorted_columns(fresh))
+    assert data.attrs == fresh.attrs
+    pd.testing.assert_frame_equal(events, index_events(detect_events(fresh)))
+    fresh_rollups = build_rollups(fresh)
+    assert list(rollups) == list(fresh_rollups)
+    for name in fresh_rollups:
+        pd.testing.assert_frame_equal(sorted_columns(rollups[name]), sorted_columns(fresh_rollups[name]))
+
+
+def test_job_started_while_base_parses_extends_it(tmp_path):
+    upload = write_log(tmp_path / 'log.csv')
+    store, ref = DatasetStore(), SessionRef()
+    base = store.acquire(ref, 'log', tuple(sorted(EVENT_SIGNALS)), False, upload)
+    job = store.acquire(ref, 'log', tuple(sorted(set(EVENT_SIGNALS) | {'MAF_gps'})), False, upload)
+    job.result()
+    assert job.base is base
+
+
+def test_failed_jobs_are_replaced(tmp_path):
+    upload = write_log(tmp_path / 'log.csv')
+    store, ref = DatasetStore(), SessionRef()
+    upload.getvalue = lambda: b'\xff\xfe'  # not a CSV
+    upload.name = 'log.parquet'
+    failed = store.acquire(ref, 'log', ('Timestamp',), False, upload)
+    failed._done.wait()
+    assert failed.failed
+    assert store.acquire(ref, 'log', ('Timestamp',), False, upload) is not failed
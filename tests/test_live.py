@@ -0,0 +1,165 @@
+import socket
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import live
+from live import CsvTail, LiveFeed, RingBuffer, UdpSource, live_csv_path
+from telemetry import time_window, timestamp_bounds
+
+
+HEADER = 'Timestamp,Engine_RPM,Coolant_Temp_C\n'
+
+
+def lines(start, stop):
+    return ''.join(f'2024-01-01 00:00:{i:02d},{1000 + i},{80 + i}\n' for i in range(start, stop))
+
+
+def test_csv_tail_reads_new_complete_lines(tmp_path):
+    path = tmp_path / 'live.csv'
+    path.write_text(HEADER + lines(0, 3))
+    tail = CsvTail(path)
+    rows = tail.read()
+    assert tail.columns == ['Timestamp', 'Engine_RPM', 'Coolant_Temp_C']
+    assert rows['Engine_RPM'].tolist() == [1000, 1001, 1002]
+    assert pd.api.types.is_datetime64_any_dtype(rows['Timestamp'])
+    assert tail.read().empty
+    partial = lines(3, 5)
+    with open(path, 'a') as f:
+        f.write(partial[:-10])
+    assert tail.read()['Engine_RPM'].tolist() == [1003]
+    with open(path, 'a') as f:
+        f.write(partial[-10:])
+    assert tail.read()['Engine_RPM'].tolist() == [1004]
+
+
+def test_csv_tail_starts_over_on_truncation(tmp_path):
+    path = tmp_path / 'live.csv'
+    path.write_text(HEADER + lines(0, 5))
+    tail = CsvTail(path)
+    tail.read()
+    path.write_text(HEADER + lines(10, 11))
+    assert tail.read()['Engine_RPM'].tolist() == [1010]
+
+
+def test_csv_tail_reads_a_quoted_header(tmp_path):
+    path = tmp_path / 'live.csv'
+    # as written by pyarrow's CSVWriter, with a BOM and Windows line endings
+    path.write_bytes(b'\xef\xbb\xbf"Timestamp","Engine_RPM","Coolant_Temp_C"\r\n' + lines(0, 2).encode())
+    tail = CsvTail(path)
+    assert tail.read()['Engine_RPM'].tolist() == [1000, 1001]
+    assert tail.columns == ['Timestamp', 'Engine_RPM', 'Coolant_Temp_C']
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def receive(source, count):
+    for _ in range(100):
+        rows = source.read()
+        if len(rows) == count:
+            return rows
+    return rows
+
+
+def test_udp_source_takes_the_column_order_from_a_header_line():
+    port = free_port()
+    source = UdpSource(port)
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            sender.sendto(HEADER.encode() + lines(0, 2).encode(), ('127.0.0.1', port))
+            sender.sendto(lines(2, 3).encode(), ('127.0.0.1', port))
+        rows = receive(source, 3)
+        assert source.columns == ['Timestamp', 'Engine_RPM', 'Coolant_Temp_C']
+        assert rows['Engine_RPM'].tolist() == [1000, 1001, 1002]
+        assert source.read().empty
+    finally:
+        source.close()
+
+
+def test_udp_source_reads_a_quoted_header():
+    port = free_port()
+    source = UdpSource(port)
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            sender.sendto(b'"Timestamp","Coolant_Temp_C","Engine_RPM"\n2024-01-01 00:00:00,80,1000\n', ('127.0.0.1', port))
+        rows = receive(source, 1)
+        assert source.columns == ['Timestamp', 'Coolant_Temp_C', 'Engine_RPM']
+        assert rows['Engine_RPM'].tolist() == [1000]
+    finally:
+        source.close()
+
+
+def batch(start, stop):
+    return pd.DataFrame({
+        'Timestamp': pd.date_range('2024-01-01', periods=stop, freq='s')[start:],
+        'Engine_RPM': np.arange(start, stop, dtype=float),
+    })
+
+
+def test_ring_buffer_keeps_the_newest_rows_in_order():
+    buffer = RingBuffer(5, ['Timestamp', 'Engine_RPM'])
+    assert len(buffer) == 0 and buffer.frame().empty
+    buffer.append(batch(0, 3))
+    buffer.append(batch(3, 7))
+    assert len(buffer) == 5
+    assert buffer.frame()['Engine_RPM'].tolist() == [2, 3, 4, 5, 6]
+    assert buffer.frame()['Timestamp'].is_monotonic_increasing
+    buffer.append(batch(7, 20))
+    assert buffer.frame()['Engine_RPM'].tolist() == [15, 16, 17, 18, 19]
+
+
+def test_ring_buffer_blanks_columns_a_batch_does_not_supply():
+    buffer = RingBuffer(3, ['Timestamp', 'Engine_RPM', 'Coolant_Temp_C'])
+    buffer.append(batch(0, 3).assign(Coolant_Temp_C=90.0))
+    buffer.append(pd.DataFrame({'Engine_RPM': [9.0]}))
+    frame = buffer.frame()
+    assert frame['Engine_RPM'].tolist() == [1, 2, 9]
+    assert frame['Timestamp'].isna().tolist() == [False, False, True]
+    assert frame['Coolant_Temp_C'].isna().tolist() == [False, False, True]
+
+
+def test_csv_tail_waits_for_a_complete_header(tmp_path):
+    path = tmp_path / 'live.csv'
+    path.write_text('')
+    tail = CsvTail(path)
+    assert tail.read().empty and tail.columns is None
+    path.write_text(HEADER[:12])
+    assert tail.read().empty and tail.columns is None
+    path.write_text(HEADER + lines(0, 1))
+    assert tail.read()['Engine_RPM'].tolist() == [1000]
+    assert tail.columns == ['Timestamp', 'Engine_RPM', 'Coolant_Temp_C']
+
+
+def test_live_feed_drops_rows_without_a_valid_timestamp(tmp_path):
+    path = tmp_path / 'live.csv'
+    path.write_text(HEADER + lines(0, 5) + 'garbage,x\n' + lines(5, 10))
+    feed = LiveFeed(CsvTail(path))
+    assert feed.poll() == 10
+    data = feed.frame()
+    assert data['Engine_RPM'].tolist() == list(range(1000, 1010))
+    bounds = timestamp_bounds(data)
+    assert bounds == (pd.Timestamp('2024-01-01 00:00:00'), pd.Timestamp('2024-01-01 00:00:09'))
+    assert len(time_window(data, *bounds)) == 10
+
+
+def test_live_feed_frame_is_sorted_by_timestamp(tmp_path):
+    path = tmp_path / 'live.csv'
+    path.write_text(HEADER + lines(5, 10) + lines(0, 5))
+    feed = LiveFeed(CsvTail(path))
+    feed.poll()
+    assert feed.frame()['Engine_RPM'].tolist() == list(range(1000, 1010))
+
+
+def test_live_csv_path_stays_inside_the_live_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(live, 'LIVE_DIR', tmp_path / 'live')
+    folder = (tmp_path / 'live').resolve()
+    assert live_csv_path('truck.csv') == folder / 'truck.csv'
+    assert live_csv_path('day1/../truck.csv') == folder / 'truck.csv'
+    for name in ('../secret.csv', '/etc/passwd', '', '.'):
+        with pytest.raises(ValueError):
+            live_csv_path(name)
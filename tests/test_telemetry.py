@@ -0,0 +1,265 @@
+from datetime import date
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from telemetry import (
+    ColumnStore,
+    ROLLUP_LEVELS,
+    RollupBuilder,
+    StreamingHistogram,
+    TelemetryQuery,
+    build_rollups,
+    detect_events,
+    exact_histogram,
+    index_events,
+    merge_events,
+    minmax_indices,
+    prepare_timestamps,
+    prune_cache,
+    read_telemetry,
+    rollup_rows,
+    select_rows,
+    timestamp_parser,
+)
+
+
+def telemetry_frame(rows=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'Timestamp': pd.date_range('2024-01-01 23:58', periods=rows, freq='250ms'),
+        'Engine_RPM': rng.normal(4000, 1500, rows).astype('float32'),
+        'Coolant_Temp_C': rng.normal(95, 8, rows).astype('float32'),
+    })
+    frame.loc[rng.choice(rows, rows // 50, replace=False), 'Coolant_Temp_C'] = np.nan
+    return frame
+
+
+def chunks(frame, size):
+    return [frame.iloc[start:start + size] for start in range(0, len(frame), size)]
+
+
+def test_minmax_indices_keeps_every_bucket_extreme():
+    values = np.zeros(1000)
+    values[[137, 600]] = [5.0, -3.0]
+    values[420] = np.nan
+    idx = minmax_indices(values, 100)
+    assert idx[0] == 0 and idx[-1] == 999
+    assert {137, 600} <= set(idx)
+    assert 420 not in idx
+    assert len(idx) <= 102 and np.all(np.diff(idx) > 0)
+    assert list(minmax_indices(np.arange(50.0), 100)) == list(range(50))
+    assert list(minmax_indices(np.arange(50.0), None)) == list(range(50))
+
+
+def test_column_store_round_trip():
+    frame = pd.DataFrame({'a': [1.0, 2.0, np.nan], 'b': pd.array([1, None, 0], dtype='Int8')})
+    store = ColumnStore('log')
+    with store.writer() as writer:
+        writer.write(frame.iloc[:2])
+        writer.write(frame.iloc[2:])
+    assert store.columns() == {'a', 'b'}
+    pd.testing.assert_frame_equal(store.read(['a', 'b'])[['a', 'b']], frame)
+    read_back = list(store.iter_chunks(['a']))
+    assert [fraction for _, fraction in read_back] == [0.5, 1.0]
+    pd.testing.assert_frame_equal(pd.concat([chunk for chunk, _ in read_back], ignore_index=True), frame[['a']])
+
+
+def test_column_store_keeps_nothing_of_a_failed_write():
+    store = ColumnStore('log')
+    with pytest.raises(RuntimeError):
+        with store.writer() as writer:
+            writer.write(pd.DataFrame({'a': [1.0]}))
+            raise RuntimeError
+    assert store.columns() == set()
+    assert not list(store.folder.glob('*.tmp'))
+
+
+def test_prune_cache_removes_least_recently_used_uploads():
+    stores = [ColumnStore(f'log{i}') for i in range(3)]
+    for i, store in enumerate(stores):
+        with store.writer() as writer:
+            writer.write(pd.DataFrame({'a': np.arange(1000.0)}))
+        os.utime(store.folder, (1000 + i, 1000 + i))
+    size = sum(path.stat().st_size for path in stores[0].folder.iterdir())
+    stores[0].read(['a'])  # marks log0 as used
+    prune_cache(max_bytes=2 * size)
+    assert [store.folder.is_dir() for store in stores] == [True, False, True]
+    prune_cache(keep=stores[2].folder, max_bytes=0)
+    assert [store.folder.is_dir() for store in stores] == [False, False, True]
+
+
+def test_streaming_histogram_range_doubling():
+    rng = np.random.default_rng(1)
+    parts = [rng.uniform(0, 1, 5000), rng.uniform(10, 11, 5000), rng.uniform(-20, -19, 5000), [np.nan]]
+    hist = StreamingHistogram(bins=256, thresholds=(5,))
+    for part in parts:
+        hist.update(part)
+    values = np.concatenate(parts[:3])
+    assert len(hist.counts) == 256
+    assert hist.counts.sum() == hist.total == values.size
+    assert hist.start <= values.min() and hist.start + hist.width * 256 > values.max()
+    assert hist.exceedances[5] == 5000
+    edges, counts = hist.binned(32)
+    assert len(counts) <= 32 and counts.sum() == values.size
+    assert edges[0] <= values.min() and edges[-1] >= values.max()
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        assert hist.quantile(q) == pytest.approx(np.quantile(values, q), abs=hist.width)
+    stats = hist.stats()
+    assert stats['mean'] == pytest.approx(values.mean())
+    assert stats['std'] == pytest.approx(values.std(ddof=1))
+
+
+def test_histograms_skip_infinite_values():
+    values = [1.0, np.inf, 7000.0, -np.inf, np.nan, 3.0]
+    hist = StreamingHistogram(bins=256)
+    hist.update(values)
+    hist.update([np.inf])
+    stats = hist.stats()
+    assert stats['count'] == 3 and stats['min'] == 1.0 and stats['max'] == 7000.0
+    assert stats['p95'] <= 7000.0
+    edges, counts = exact_histogram('inf', 'x', 10, pd.Series(values))
+    assert counts.sum() == 3 and edges[0] == 1.0 and edges[-1] == 7000.0
+
+
+def test_merge_events_joins_runs_across_chunks():
+    data = telemetry_frame(rows=1000)
+    data['Engine_RPM'] = np.float32(3000)
+    data.loc[95:130, 'Engine_RPM'] = np.float32(7000)  # crosses the boundaries at rows 100 and 120
+    data.loc[300:305, 'Engine_RPM'] = np.float32(6800)
+    data.loc[199:200, 'Coolant_Temp_C'] = np.float32(110)
+    per_chunk, offset = [], 0
+    for chunk in chunks(data, 20):
+        per_chunk.append(detect_events(chunk, offset))
+        offset += len(chunk)
+    expected = index_events(detect_events(data))
+    pd.testing.assert_frame_equal(index_events(merge_events(per_chunk)), expected, check_dtype=False)
+    assert expected.loc[expected['event'] == 'overrev', 'rows'].tolist() == [36, 6]
+
+
+def test_select_rows_projects_before_reducing():
+    data = telemetry_frame(rows=10_000)
+    data['Unused'] = 1.0
+    data.loc[4321, 'Engine_RPM'] = np.float32(20_000)
+    rows = select_rows(data, ['Engine_RPM'], 200)
+    assert list(rows.columns) == ['Timestamp', 'Engine_RPM']
+    assert len(rows) <= 202 and 4321 in rows.index
+    assert rows.index.is_monotonic_increasing
+    sample = select_rows(data, ['Engine_RPM', 'Coolant_Temp_C'], 300, reduce='sample')
+    assert len(sample) == 300 and sample.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(sample, select_rows(data, ['Engine_RPM', 'Coolant_Temp_C'], 300, reduce='sample'))
+    pd.testing.assert_frame_equal(select_rows(data, ['Engine_RPM'], None), data[['Timestamp', 'Engine_RPM']])
+
+
+def test_rollup_builder_matches_build_rollups():
+    data = telemetry_frame()
+    builder = RollupBuilder()
+    for chunk in chunks(data, 3001):
+        builder.update(chunk)
+    streamed, built = builder.finish(), build_rollups(data)
+    assert list(streamed) == list(built)
+    for name in built:
+        pd.testing.assert_frame_equal(streamed[name], built[name], check_exact=False, rtol=1e-5)
+
+
+@pytest.mark.parametrize('name', ['10s', '1min'])
+def test_rollup_levels_match_resample(name):
+    data = telemetry_frame()
+    level = build_rollups(data)[name].set_index('Timestamp')
+    resampled = data.set_index('Timestamp').resample(ROLLUP_LEVELS[name])
+    for col in ('Engine_RPM', 'Coolant_Temp_C'):
+        expected = resampled[col].agg(['min', 'max', 'mean', 'count'])
+        expected = expected[expected['count'] > 0]
+        actual = level[[f'{col}_{stat}' for stat in ('min', 'max', 'mean', 'count')]]
+        actual.columns = expected.columns
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_freq=False, check_names=False, rtol=1e-5)
+
+
+def test_rollup_rows_uses_the_coarsest_level_that_fills_the_chart():
+    data = telemetry_frame(rows=200_000)  # about 14 hours
+    rollups = build_rollups(data)
+    start, end = data['Timestamp'].iloc[0], data['Timestamp'].iloc[-1]
+    rows = rollup_rows(rollups, ['Engine_RPM'], start, end, 1000)
+    assert list(rows.columns) == ['Timestamp', 'Engine_RPM'] and len(rows) == 1000
+    # 500 buckets merged from the 1min level, each drawn as its min then its max
+    lows, highs = rows['Engine_RPM'].to_numpy()[0::2], rows['Engine_RPM'].to_numpy()[1::2]
+    assert lows.min() == data['Engine_RPM'].min() and highs.max() == data['Engine_RPM'].max()
+    assert np.all(lows <= highs)
+    # a short window has too few buckets at every level and is left to the raw rows
+    assert rollup_rows(rollups, ['Engine_RPM'], start, start + pd.Timedelta(minutes=2), 1000) is None
+    assert rollup_rows(rollups, ['Oil_Temp_C'], start, end, 1000) is None
+
+
+def test_telemetry_query_selects_the_window_and_the_day():
+    data = telemetry_frame()  # 23:58 on January 1st to about 01:21 the next day
+    query = TelemetryQuery(data, 'log')
+    assert list(query.days()) == [date(2024, 1, 1), date(2024, 1, 2)]
+    start, end = pd.Timestamp('2024-01-01 23:59'), pd.Timestamp('2024-01-02 00:01')
+    query = query.select((start, end), date(2024, 1, 1))
+    rows = query.rows()
+    assert len(rows) == 481 and rows['Timestamp'].between(start, end).all()
+    day = query.rows(day=True)
+    assert len(day) == 240 and day['Timestamp'].iloc[-1] < pd.Timestamp('2024-01-02')
+    view = query.series(['Engine_RPM'], 100, day=True)
+    assert list(view.columns) == ['Timestamp', 'Engine_RPM'] and len(view) <= 102
+    assert view['Engine_RPM'].max() == day['Engine_RPM'].max()
+    assert query.select().rows(day=True).empty and len(query.select().rows()) == len(data)
+
+
+def test_telemetry_query_serves_long_windows_from_rollups():
+    data = telemetry_frame()
+    rollups = build_rollups(data)
+    query = TelemetryQuery(data, 'log', rollups=rollups)
+    query = query.select(query.bounds())
+    expected = rollup_rows(rollups, ['Engine_RPM'], *query.bounds(), 100)
+    assert expected is not None
+    pd.testing.assert_frame_equal(query.series(['Engine_RPM'], 100), expected)
+    assert len(query.sample(['Engine_RPM', 'Coolant_Temp_C'], 300)) == 300
+
+
+def test_telemetry_query_histograms():
+    data = telemetry_frame(rows=1000)
+    hist = StreamingHistogram()
+    hist.update(data['Engine_RPM'])
+    edges, counts = TelemetryQuery(data, histograms={'Engine_RPM': hist}).histogram('Engine_RPM', 10)
+    assert counts.sum() == 1000 and len(counts) <= 10
+    # frames that are not uploads, such as the live buffer, are binned afresh on every call
+    assert TelemetryQuery(data).histogram('Engine_RPM', 10)[1].sum() == 1000
+    assert TelemetryQuery(data.iloc[:10]).histogram('Engine_RPM', 10)[1].sum() == 10
+
+
+def test_build_rollups_without_timestamps():
+    assert build_rollups(pd.DataFrame({'Timestamp': pd.to_datetime([None, None]), 'x': [1.0, 2.0]})) == {}
+    assert build_rollups(pd.DataFrame({'x': [1.0, 2.0]})) == {}
+
+
+@pytest.mark.parametrize('values, expected', [
+    (['2024-01-01 00:00:00', '2024-01-01T00:00:01Z', '2024-01-01 00:00:02'], {'format': 'ISO8601'}),
+    ([1704067200, 1704067201, 1704067202], {'unit': 's'}),
+    (['1704067200000', '1704067201000', '1704067202000'], {'unit': 'ms'}),
+    ([f'01/{day}/2024 10:00' for day in range(13, 31)], {'format': '%m/%d/%Y %H:%M'}),
+    (['garbage'] + [f'01/{day}/2024 10:00' for day in range(13, 31)], {'format': '%m/%d/%Y %H:%M'}),
+    (['a', 'b', 'c'], None),
+    ([None, None], None),
+])
+def test_timestamp_parser(values, expected):
+    assert timestamp_parser(pd.Series(values)) == expected
+
+
+def test_prepare_timestamps_keeps_repeated_times():
+    data = pd.DataFrame({
+        'Timestamp': ['2024-01-01 00:00:02', '2024-01-01 00:00:01', '2024-01-01 00:00:01', 'garbage'],
+        'x': [3.0, 1.0, 2.0, 4.0],
+    })
+    data = prepare_timestamps(data)
+    assert data['x'].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert data.attrs == {'missing_timestamps': 1, 'duplicate_timestamps': 1}
+
+
+def test_read_telemetry_without_any_requested_column():
+    upload = io.BytesIO(b'a,b\n1,2\n')
+    upload.name = 'log.csv'
+    assert read_telemetry('log', ('Timestamp', 'Engine_RPM'), upload).empty